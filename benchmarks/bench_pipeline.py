@@ -0,0 +1,271 @@
+"""Scaling benchmark for the parsing and statistics pipeline.
+
+Times (wall and CPU) and memory-profiles every stage on synthetic exports of
+several sizes and stores the results as JSON, so runs can be compared::
+
+    python benchmarks/bench_pipeline.py --sizes 10k 100k 1m --label main
+    python benchmarks/bench_pipeline.py --sizes 10k 100k --compare benchmarks/results/main.json
+
+Stages, in pipeline order:
+
+* ``load``      – ``json.load`` of the whole file (the decode floor; the app streams instead)
+* ``normalize`` – streaming parse into :class:`~chatgpt_wrapped.MessageColumns` (what the app runs)
+* ``dataframe`` – ``MessageColumns.to_frame``
+* ``derive``    – calendar columns for the user messages
+* ``stats``     – aggregates, Quick Stats, Usage Patterns and histograms
+* ``turns``     – answer times and sessions
+* ``index``     – :class:`~chatgpt_wrapped.search.SearchIndex` build
+* ``search``    – a term, a prefix and a phrase query against the index
+* ``prompt``    – ``build_prompt`` with the default token budget
+* ``streaming`` – the same stats from one pass over the file with
+  :class:`~chatgpt_wrapped.streaming.StreamingStats`, no message table (what the CLI runs)
+
+Each size runs in a fresh process so peak RSS is not inherited from earlier
+sizes. Generated exports are kept in ``benchmarks/data`` and reused.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+sys.path.insert(0, str(ROOT))
+
+from chatgpt_wrapped import MessageColumns, add_calendar_columns, parse_export  # noqa: E402
+from chatgpt_wrapped.instrument import peak_rss_mb, reset_peak_rss  # noqa: E402
+from chatgpt_wrapped.pipeline import MESSAGE_ROLES, TEXT_ROLES, aggregate, histograms, quick_stats, usage_patterns  # noqa: E402
+from chatgpt_wrapped.prompt import build_prompt  # noqa: E402
+from chatgpt_wrapped.search import SearchIndex  # noqa: E402
+from chatgpt_wrapped.streaming import StreamingStats  # noqa: E402
+from chatgpt_wrapped.synthetic import write_export  # noqa: E402
+from chatgpt_wrapped.turns import turn_stats  # noqa: E402
+
+STAGES = ('load', 'normalize', 'dataframe', 'derive', 'stats', 'turns', 'index', 'search', 'prompt', 'streaming')
+SEARCH_QUERIES = ('please example', 'ex*', '"please explain"')
+DATA_DIR = HERE / 'data'
+RESULTS_DIR = HERE / 'results'
+DEFAULT_SIZES = ('10k', '100k')
+DEFAULT_THRESHOLD = 0.25  # relative slowdown reported as a regression
+DEFAULT_MIN_DELTA = 0.02  # seconds; smaller slowdowns are timer noise
+
+
+def parse_size(text: str) -> int:
+    """``'10k'`` → 10000, ``'1m'`` → 1000000."""
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+def export_path(n_messages: int, seed: int) -> Path:
+    """Synthetic export with ``n_messages`` messages, generated on first use."""
+    path = DATA_DIR / f'export-{n_messages}-s{seed}.json'
+    if not path.exists():
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        print(f'Generating {path.name}...', file=sys.stderr)
+        with open(tmp, 'w', encoding='utf-8') as fp:
+            write_export(fp, n_messages, seed=seed)
+        os.replace(tmp, path)
+    return path
+
+
+# ────────────────────────  Worker (one size)  ───────────────────
+def _load(path: Path) -> int:
+    with open(path, 'rb') as fp:
+        return len(json.load(fp))
+
+
+def _report(stats: dict, total_convos: int) -> dict:
+    return {
+        'quick_stats': quick_stats(stats, total_convos),
+        'usage_patterns': usage_patterns(stats),
+        'histograms': histograms(stats),
+    }
+
+
+def _streaming(path: Path) -> dict:
+    with open(path, 'rb') as fp:
+        sink, total_convos = parse_export(fp, StreamingStats(keep_roles={'user'}))
+    return _report(sink.result(), total_convos)
+
+
+def _run_pipeline(path: Path, measure) -> dict:
+    """Run every stage through ``measure(stage, fn)``; return row counts."""
+    measure('load', lambda: _load(path))
+    with open(path, 'rb') as fp:
+        columns, total_convos = measure('normalize', lambda: parse_export(fp, MessageColumns(MESSAGE_ROLES, TEXT_ROLES)))
+    df = measure('dataframe', columns.to_frame)
+    user_df = measure('derive', lambda: add_calendar_columns(df[df['role'] == 'user']))
+    measure('stats', lambda: _report(aggregate(user_df), total_convos))
+    measure('turns', lambda: turn_stats(df))
+    index = measure('index', lambda: SearchIndex.build(df))
+    hits = measure('search', lambda: [index.search(df, query)['count'] for query in SEARCH_QUERIES])
+    prompt = measure('prompt', lambda: build_prompt(user_df))
+    # tests/test_streaming.py checks that both paths agree
+    measure('streaming', lambda: _streaming(path))
+    return {
+        'messages_seen': columns.seen,
+        'user_messages': len(user_df),
+        'conversations': total_convos,
+        'prompt_chars': len(prompt),
+        'search_hits': hits,
+    }
+
+
+def run_worker(path: Path, repeat: int, memory: bool) -> dict:
+    """Best-of-``repeat`` timings plus memory figures for every stage."""
+    stages = {stage: {'wall_s': float('inf'), 'cpu_s': float('inf')} for stage in STAGES}
+    counts = {}
+    for attempt in range(repeat):
+        def timed(stage, fn):
+            if attempt == 0:
+                reset_peak_rss()
+            wall, cpu = time.perf_counter(), time.process_time()
+            result = fn()
+            record = stages[stage]
+            record['wall_s'] = min(record['wall_s'], time.perf_counter() - wall)
+            record['cpu_s'] = min(record['cpu_s'], time.process_time() - cpu)
+            if attempt == 0:
+                # Peak RSS during the stage where the counter can be reset, else since process start
+                record['rss_peak_mb'] = peak_rss_mb()
+            return result
+
+        counts = _run_pipeline(path, timed)
+
+    if memory:
+        # Separate pass: tracemalloc slows Python code down too much to time with it on
+        tracemalloc.start()
+
+        def traced(stage, fn):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = fn()
+            stages[stage]['py_peak_mb'] = (tracemalloc.get_traced_memory()[1] - before) / (1 << 20)
+            return result
+
+        _run_pipeline(path, traced)
+        tracemalloc.stop()
+
+    return {'file_mb': path.stat().st_size / (1 << 20), **counts, 'stages': stages}
+
+
+# ────────────────────────  Driver  ──────────────────────────────
+def _environment() -> dict:
+    import numpy
+    import pandas
+    import pyarrow
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'git': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': {'numpy': numpy.__version__, 'pandas': pandas.__version__, 'pyarrow': pyarrow.__version__},
+    }
+
+
+def run_suite(sizes: list[int], seed: int, repeat: int, memory: bool) -> dict:
+    results = {}
+    for size in sizes:
+        path = export_path(size, seed)
+        print(f'Benchmarking {size:,} messages ({path.stat().st_size / 1e6:.0f} MB)...', file=sys.stderr)
+        command = [sys.executable, __file__, '--worker', str(path), '--repeat', str(repeat)]
+        if not memory:
+            command.append('--no-memory')
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        results[str(size)] = json.loads(output.splitlines()[-1])
+    return results
+
+
+def print_results(sizes: dict) -> None:
+    print(f"{'size':>9} {'stage':<10} {'wall s':>8} {'cpu s':>8} {'rss MB':>8} {'py MB':>8}")
+    for size, result in sizes.items():
+        for stage in STAGES:
+            record = result['stages'][stage]
+            py, rss = record.get('py_peak_mb'), record['rss_peak_mb']
+            print(
+                f"{int(size):>9,} {stage:<10} {record['wall_s']:>8.3f} {record['cpu_s']:>8.3f} "
+                f"{'' if rss is None else f'{rss:.0f}':>8} {'' if py is None else f'{py:.0f}':>8}"
+            )
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta: float = DEFAULT_MIN_DELTA) -> list[str]:
+    """Print wall-time ratios against ``baseline``; return the regressions found."""
+    regressions = []
+    print(f"\n{'size':>9} {'stage':<10} {'base s':>8} {'now s':>8} {'ratio':>6}")
+    for size, result in current['sizes'].items():
+        if size not in baseline['sizes']:
+            continue
+        for stage in STAGES:
+            old = baseline['sizes'][size]['stages'].get(stage, {}).get('wall_s')
+            new = result['stages'][stage]['wall_s']
+            if not old:
+                continue
+            ratio = new / old
+            flag = ' !' if ratio > 1 + threshold and new - old > min_delta else ''
+            print(f'{int(size):>9,} {stage:<10} {old:>8.3f} {new:>8.3f} {ratio:>6.2f}{flag}')
+            if flag:
+                regressions.append(f'{stage} at {int(size):,} messages: {old:.3f}s -> {new:.3f}s')
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES), help='message counts, e.g. 10k 100k 1m')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per size; the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the synthetic exports')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--label', help='results name (default: timestamp and git commit)')
+    parser.add_argument('--compare', help='earlier results file; exit 1 if any stage got slower than --threshold')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='relative slowdown that counts as a regression')
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA, help='ignore slowdowns below this many seconds')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(Path(args.worker), args.repeat, not args.no_memory)))
+        return 0
+
+    environment = _environment()
+    created = datetime.now(timezone.utc)
+    label = args.label or f"{created:%Y%m%d-%H%M%S}-{environment['git'] or 'nogit'}"
+    results = {
+        'label': label,
+        'created': created.isoformat(),
+        **environment,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'sizes': run_suite([parse_size(s) for s in args.sizes], args.seed, args.repeat, not args.no_memory),
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f'{label}.json'
+    path.write_text(json.dumps(results, indent=2))
+    print_results(results['sizes'])
+    print(f'\nSaved {path}')
+
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text()), results, args.threshold, args.min_delta)
+        if regressions:
+            print('\nRegressions:\n  ' + '\n  '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Parsing and statistics engine behind the ChatGPT Wrapped Streamlit app."""
+
+from chatgpt_wrapped.cache import ResponseCache, ResultCache, content_hash
+from chatgpt_wrapped.charts import DailyLevels
+from chatgpt_wrapped.derive import DAY_NAMES, MONTH_NAMES, add_calendar_columns
+from chatgpt_wrapped.history import HistoryStore
+from chatgpt_wrapped.jobs import JobQueue, RateLimiter
+from chatgpt_wrapped.parsing import (
+    MessageColumns,
+    extract_messages,
+    iter_conversations,
+    make_executor,
+    normalize_conversation,
+    open_export,
+    parse_export,
+    parse_export_parallel,
+)
+from chatgpt_wrapped.pipeline import (
+    analyze,
+    build_report,
+    describe,
+    histograms,
+    load_export,
+    quick_stats,
+    stream_export,
+    usage_patterns,
+    user_messages,
+)
+from chatgpt_wrapped.search import SearchIndex
+from chatgpt_wrapped.streaming import StreamingStats
+from chatgpt_wrapped.topics import extract_topics
+
+__all__ = [
+    'DAY_NAMES',
+    'DailyLevels',
+    'HistoryStore',
+    'JobQueue',
+    'MONTH_NAMES',
+    'MessageColumns',
+    'RateLimiter',
+    'ResponseCache',
+    'ResultCache',
+    'SearchIndex',
+    'StreamingStats',
+    'add_calendar_columns',
+    'analyze',
+    'build_report',
+    'content_hash',
+    'describe',
+    'extract_messages',
+    'extract_topics',
+    'histograms',
+    'iter_conversations',
+    'load_export',
+    'make_executor',
+    'normalize_conversation',
+    'open_export',
+    'parse_export',
+    'parse_export_parallel',
+    'quick_stats',
+    'stream_export',
+    'usage_patterns',
+    'user_messages',
+]
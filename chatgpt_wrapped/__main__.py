@@ -0,0 +1,5 @@
+import sys
+
+from chatgpt_wrapped.cli import main
+
+sys.exit(main())
@@ -0,0 +1,357 @@
+"""Content-addressed caches for parsed exports, derived statistics and model responses.
+
+:class:`ResultCache` entries are keyed by a hash of the uploaded bytes plus a
+stage name and live in two tiers: an in-process LRU capped by bytes (instant
+on Streamlit reruns) and an on-disk Parquet tier that survives restarts, expires after a
+TTL and is evicted by total size. :class:`ResponseCache` keeps paid model calls (insight JSON and
+rendered images) on disk, keyed by model, parameters and prompt, with a TTL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Iterator
+
+import pandas as pd
+
+# Bump when the parser or derived columns change so stale entries are ignored.
+CACHE_VERSION = 4
+_HASH_CHUNK = 1 << 20
+
+
+def content_hash(fp: IO) -> str:
+    """Return the SHA-256 hex digest of a binary file object, leaving it rewound."""
+    digest = hashlib.sha256()
+    fp.seek(0)
+    for chunk in iter(lambda: fp.read(_HASH_CHUNK), b''):
+        digest.update(chunk)
+    fp.seek(0)
+    return digest.hexdigest()
+
+
+@contextmanager
+def staged_dir(path: Path) -> Iterator[Path]:
+    """Yield an empty directory to fill; it replaces ``path`` when the block succeeds.
+
+    Every writer stages in its own hidden directory, so concurrent writers of
+    the same entry never delete each other's files, and readers only ever see
+    a complete entry. The staging directory is removed if the block fails.
+    """
+    tmp = path.parent / f'.{path.name}-{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}.tmp'
+    tmp.mkdir(parents=True)
+    try:
+        yield tmp
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # Another writer published the same entry in between; either copy is complete
+            if not path.exists():
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def entries_on_disk(directory: Path, stamp: str = 'meta.json') -> list[tuple[float, int, Path]]:
+    """``(mtime of stamp, total bytes, path)`` for every entry directory in ``directory``.
+
+    Staging directories and entries without a ``stamp`` file are skipped.
+    """
+    if not directory.exists():
+        return []
+    entries = []
+    for path in directory.iterdir():
+        if path.name.startswith('.'):
+            continue
+        try:
+            size = sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+            entries.append(((path / stamp).stat().st_mtime, size, path))
+        except OSError:
+            # Missing stamp or evicted concurrently
+            continue
+    return entries
+
+
+def drop_expired(entries: list[tuple[float, int, Path]], ttl_seconds: float) -> list[tuple[float, int, Path]]:
+    """Delete the :func:`entries_on_disk` created more than ``ttl_seconds`` ago; return the rest."""
+    kept = []
+    now = time.time()
+    for entry in entries:
+        try:
+            created = json.loads((entry[2] / 'meta.json').read_text())['created']
+        except (OSError, ValueError, KeyError):
+            # Unreadable or from an older version; it would be dropped on read anyway
+            created = 0.0
+        if now - created > ttl_seconds:
+            shutil.rmtree(entry[2], ignore_errors=True)
+        else:
+            kept.append(entry)
+    return kept
+
+
+def evict_lru(entries: list[tuple[float, int, Path]], max_bytes: int) -> None:
+    """Delete the least recently stamped of :func:`entries_on_disk` until the rest fit ``max_bytes``."""
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def _entry_bytes(entry: dict) -> int:
+    """Memory held by the frames and series of a cache entry; scalars are negligible."""
+    return sum(
+        int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else value.memory_usage(deep=True)
+        for value in entry.values()
+        if isinstance(value, (pd.DataFrame, pd.Series))
+    )
+
+
+class ResultCache:
+    """Two-tier cache of ``{name: DataFrame | Series | scalar}`` entries.
+
+    DataFrames and Series are written as one Parquet file each, JSON-serializable
+    scalars go to ``meta.json``. Disk entries older than ``ttl_seconds`` are
+    treated as misses and removed, so uploaded message text does not outlive
+    the TTL on disk. Cached frames are shared between callers and must be
+    treated as read-only.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        max_memory_bytes: int = 1 << 30,
+        max_disk_bytes: int = 2 << 30,
+        ttl_seconds: float = 24 * 3600,
+    ):
+        self.directory = Path(directory)
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        # key -> (entry, bytes held by its frames and series)
+        self._memory: OrderedDict[str, tuple[dict, int]] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ────────────────────────  Public API  ──────────────────────────
+    def get_or_compute(self, digest: str, stage: str, compute: Callable[[], dict]) -> dict:
+        """Return the cached entry for ``(digest, stage)``, computing and storing it on a miss."""
+        key = self._key(digest, stage)
+        entry = self.get(key)
+        if entry is None:
+            entry = compute()
+            self.put(key, entry)
+        return entry
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return cached[0]
+
+        entry = self._read_disk(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        size = _entry_bytes(entry)
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, entry, size)
+        return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        size = _entry_bytes(entry)
+        with self._lock:
+            self._remember(key, entry, size)
+        try:
+            self._write_disk(key, entry)
+            self._evict_disk()
+        except (OSError, ValueError, TypeError) as e:
+            # The memory tier still holds the entry; a failed disk write only costs a re-parse later
+            print(f"Console: Could not persist cache entry {key}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_usage(),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # ────────────────────────  Memory tier  ─────────────────────────
+    @staticmethod
+    def _key(digest: str, stage: str) -> str:
+        return f'{digest}-{stage}-v{CACHE_VERSION}'
+
+    def _remember(self, key: str, entry: dict, size: int) -> None:
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous[1]
+        if size > self.max_memory_bytes:
+            # Would evict everything else; it is served from disk instead
+            return
+        self._memory[key] = (entry, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted
+
+    # ────────────────────────  Disk tier  ───────────────────────────
+    def _read_disk(self, key: str) -> dict | None:
+        path = self.directory / key
+        meta_path = path / 'meta.json'
+        if not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text())
+            if time.time() - meta['created'] > self.ttl_seconds:
+                shutil.rmtree(path, ignore_errors=True)
+                return None
+            entry = dict(meta['scalars'])
+            for name in meta['frames']:
+                entry[name] = pd.read_parquet(path / f'{name}.parquet')
+            for name in meta['series']:
+                frame = pd.read_parquet(path / f'{name}.parquet')
+                entry[name] = frame.iloc[:, 0].rename(meta['series'][name])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Console: Dropping unreadable cache entry {key}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        # Touch for LRU eviction on disk
+        os.utime(meta_path)
+        return entry
+
+    def _write_disk(self, key: str, entry: dict) -> None:
+        with staged_dir(self.directory / key) as tmp:
+            meta: dict = {'created': time.time(), 'scalars': {}, 'frames': [], 'series': {}}
+            for name, value in entry.items():
+                if isinstance(value, pd.DataFrame):
+                    value.to_parquet(tmp / f'{name}.parquet')
+                    meta['frames'].append(name)
+                elif isinstance(value, pd.Series):
+                    value.to_frame('value').to_parquet(tmp / f'{name}.parquet')
+                    meta['series'][name] = value.name
+                else:
+                    # Unwrap numpy scalars so they serialize as plain JSON numbers
+                    meta['scalars'][name] = value.item() if hasattr(value, 'item') else value
+            (tmp / 'meta.json').write_text(json.dumps(meta))
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in entries_on_disk(self.directory))
+
+    def _evict_disk(self) -> None:
+        evict_lru(drop_expired(entries_on_disk(self.directory), self.ttl_seconds), self.max_disk_bytes)
+
+
+class ResponseCache:
+    """Disk cache of model responses: parsed JSON answers and PNG images.
+
+    Each entry is a directory holding ``meta.json`` (creation time, touched on
+    every hit for LRU order) and one payload file. Entries older than
+    ``ttl_seconds`` are treated as misses and removed; the least recently used
+    entries are evicted once the directory grows past ``max_disk_bytes``.
+    """
+
+    def __init__(self, directory: str | os.PathLike, ttl_seconds: float = 7 * 24 * 3600, max_disk_bytes: int = 256 << 20):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ────────────────────────  Public API  ──────────────────────────
+    @staticmethod
+    def key(model_id: str, params: dict, prompt: str) -> str:
+        """Stable key for one model call; ``params`` must be JSON-serializable."""
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8', 'surrogatepass')).hexdigest()
+        spec = json.dumps({'model': model_id, 'params': params, 'prompt': prompt_hash}, sort_keys=True)
+        return f'{hashlib.sha256(spec.encode()).hexdigest()}-v{CACHE_VERSION}'
+
+    def get_json(self, key: str):
+        data = self._get(key, 'response.json')
+        return None if data is None else json.loads(data)
+
+    def put_json(self, key: str, value) -> None:
+        self._put(key, 'response.json', json.dumps(value).encode())
+
+    def get_image(self, key: str) -> bytes | None:
+        """Return the cached PNG bytes for ``key``, if any."""
+        return self._get(key, 'image.png')
+
+    def put_image(self, key: str, png: bytes) -> None:
+        self._put(key, 'image.png', png)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'disk_bytes': sum(size for _, size, _ in entries_on_disk(self.directory)),
+            }
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # ────────────────────────  Disk  ────────────────────────────────
+    def _get(self, key: str, name: str) -> bytes | None:
+        path = self.directory / key
+        try:
+            meta = json.loads((path / 'meta.json').read_text())
+            if time.time() - meta['created'] > self.ttl_seconds:
+                shutil.rmtree(path, ignore_errors=True)
+                data = None
+            else:
+                data = (path / name).read_bytes()
+                # Touch for LRU eviction
+                os.utime(path / 'meta.json')
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Console: Dropping unreadable response cache entry {key}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            data = None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def _put(self, key: str, name: str, data: bytes) -> None:
+        try:
+            with staged_dir(self.directory / key) as tmp:
+                (tmp / name).write_bytes(data)
+                (tmp / 'meta.json').write_text(json.dumps({'created': time.time()}))
+            evict_lru(drop_expired(entries_on_disk(self.directory), self.ttl_seconds), self.max_disk_bytes)
+        except OSError as e:
+            # Only costs a repeated model call later
+            print(f"Console: Could not persist response cache entry {key}: {e}")
@@ -0,0 +1,81 @@
+"""Level-of-detail views of the requests-per-day series for charting.
+
+A multi-year history has thousands of active days, and one bar per day makes
+the chart slow to render and the page payload large. :class:`DailyLevels`
+precomputes day, week (Monday-based) and calendar-month buckets once from the
+per-day counts. :meth:`DailyLevels.view` then answers any date range at the
+finest level that fits a point budget. Bucket sums are exact even where the
+range cuts a week or month in half, because they come from prefix sums over
+the days. A view costs O(log days + points); the message table is never read.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from chatgpt_wrapped.derive import _EPOCH_WEEKDAY
+
+DEFAULT_POINT_BUDGET = 400
+LEVELS = ('day', 'week', 'month')
+
+
+def _day_number(date: dt.date) -> int:
+    return (date - dt.date(1970, 1, 1)).days
+
+
+class DailyLevels:
+    """Day, week and month aggregates of a Series keyed by ``day`` (days since epoch)."""
+
+    def __init__(self, daily_counts: pd.Series):
+        days = daily_counts.index.to_numpy(dtype=np.int64)
+        order = np.argsort(days, kind='stable')
+        self.days = days[order]
+        # cumulative[i] = requests on days[:i]
+        self.cumulative = np.concatenate(([0], np.cumsum(daily_counts.to_numpy(dtype=np.int64)[order])))
+        week = self.days - (self.days + _EPOCH_WEEKDAY) % 7
+        month = self.days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+        # Start day of every non-empty bucket, per level
+        self.starts = {'day': self.days, 'week': np.unique(week), 'month': np.unique(month)}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def span(self) -> tuple[dt.date, dt.date]:
+        """First and last active date."""
+        first, last = (self.days[[0, -1]] if len(self.days) else np.zeros(2, dtype=np.int64)).tolist()
+        return dt.date(1970, 1, 1) + dt.timedelta(first), dt.date(1970, 1, 1) + dt.timedelta(last)
+
+    def view(
+        self,
+        start: dt.date | None = None,
+        end: dt.date | None = None,
+        budget: int = DEFAULT_POINT_BUDGET,
+    ) -> tuple[str, pd.Series]:
+        """Requests per bucket between ``start`` and ``end`` (inclusive, default the whole span).
+
+        Returns the level used and a Series indexed by the bucket's first
+        date; buckets cut by the range only count its days. Uses the finest
+        level with at most ``budget`` buckets, or months if none fits.
+        """
+        lo = _day_number(start) if start is not None else -(1 << 62)
+        hi = _day_number(end) if end is not None else 1 << 62
+        first = int(np.searchsorted(self.days, lo, side='left'))
+        stop = int(np.searchsorted(self.days, hi, side='right'))
+        for level in LEVELS:
+            starts = self.starts[level]
+            # Buckets that hold an active day of the range
+            a = int(np.searchsorted(starts, self.days[first], side='right')) - 1 if first < stop else 0
+            b = int(np.searchsorted(starts, self.days[stop - 1], side='right')) if first < stop else 0
+            if b - a <= budget or level == LEVELS[-1]:
+                break
+        bucket_starts = starts[a:b]
+        # Buckets are consecutive, so each ends where the next begins; prefix
+        # sums between the clipped day positions give the requests in range
+        edges = np.clip(np.append(np.searchsorted(self.days, bucket_starts, side='left'), stop), first, stop)
+        counts = self.cumulative[edges[1:]] - self.cumulative[edges[:-1]]
+        dates = pd.to_datetime(bucket_starts, unit='D').date
+        return level, pd.Series(counts, index=pd.Index(dates, name='date' if level == 'day' else level))
@@ -0,0 +1,143 @@
+"""Batch reports for many exports without the Streamlit page.
+
+    python -m chatgpt_wrapped exports/*.zip --out reports --format parquet --workers 4
+
+Exports are ``conversations.json`` files or the zip archives OpenAI sends,
+which are read without unpacking them. Each export is processed in its own
+worker process and produces one report next to the others in ``--out``:
+``<name>.json``, or ``<name>.parquet`` holding the histograms as a long table
+with the Quick Stats and Usage Patterns in the file metadata. Exports are
+aggregated in one streaming pass without building the message table
+(``--dataframe`` goes through the table like the page does).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from chatgpt_wrapped.parsing import make_executor
+from chatgpt_wrapped.pipeline import analyze
+
+REPORT_FORMATS = ('json', 'parquet')
+_PARQUET_META_KEY = b'chatgpt_wrapped'
+
+
+def write_report(report: dict, path: Path, fmt: str = 'json') -> Path:
+    """Write ``report`` (from :func:`~chatgpt_wrapped.pipeline.build_report`) to ``path`` plus the format suffix."""
+    path = path.with_name(f'{path.name}.{fmt}')
+    if fmt == 'json':
+        path.write_text(json.dumps(report, indent=2))
+    elif fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = [
+            (name, bucket, count)
+            for name, counts in report['histograms'].items()
+            for bucket, count in counts.items()
+        ]
+        table = pa.Table.from_pandas(
+            pd.DataFrame(rows, columns=['histogram', 'bucket', 'count']).astype({'histogram': 'category'}),
+            preserve_index=False,
+        )
+        summary = {k: v for k, v in report.items() if k != 'histograms'}
+        table = table.replace_schema_metadata({**table.schema.metadata, _PARQUET_META_KEY: json.dumps(summary).encode()})
+        pq.write_table(table, path)
+    else:
+        raise ValueError(f'unknown report format {fmt!r}')
+    return path
+
+
+def read_parquet_report(path: str | os.PathLike) -> dict:
+    """Load a report written with ``fmt='parquet'`` back into the JSON layout."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    report = json.loads(table.schema.metadata[_PARQUET_META_KEY])
+    report['histograms'] = {}
+    for name, bucket, count in zip(*(table.column(c).to_pylist() for c in ('histogram', 'bucket', 'count'))):
+        report['histograms'].setdefault(name, {})[bucket] = count
+    return report
+
+
+def _process_export(source: str, destination: str, fmt: str, streaming: bool = True, all_branches: bool = False) -> dict:
+    """Worker: analyze one export and write its report."""
+    started = time.perf_counter()
+    with open(source, 'rb') as fp:
+        report = analyze(fp, streaming=streaming, all_branches=all_branches)
+    if report is None:
+        return {'source': source, 'report': None, 'seconds': time.perf_counter() - started}
+    report = {'source': os.path.abspath(source), **report}
+    path = write_report(report, Path(destination), fmt)
+    return {
+        'source': source,
+        'report': str(path),
+        'messages': report['quick_stats']['total_requests'],
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _report_names(sources: list[str]) -> list[str]:
+    """One report name per export, made unique where names collide.
+
+    Exports named ``conversations.json`` are named after their directory.
+    """
+    seen: dict[str, int] = {}
+    names = []
+    for source in sources:
+        path = Path(source).absolute()
+        stem = path.parent.name if path.stem == 'conversations' and path.parent.name else path.stem
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append(stem if seen[stem] == 1 else f'{stem}-{seen[stem]}')
+    return names
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m chatgpt_wrapped', description='Write a usage report for each ChatGPT export.')
+    parser.add_argument('exports', nargs='+', help='conversations.json files or export zips, or directories to search for conversations.json')
+    parser.add_argument('-o', '--out', default='reports', help='directory for the reports (default: %(default)s)')
+    parser.add_argument('-f', '--format', choices=REPORT_FORMATS, default='json', help='report format (default: %(default)s)')
+    parser.add_argument('-w', '--workers', type=int, default=0, help='exports processed at once (default: all cores)')
+    parser.add_argument('--dataframe', action='store_true', help='build the message table instead of aggregating in one pass')
+    parser.add_argument('--all-branches', action='store_true', help='also count edited prompts and regenerated answers')
+    args = parser.parse_args(argv)
+
+    sources = []
+    for entry in args.exports:
+        path = Path(entry)
+        sources.extend(sorted(str(p) for p in path.rglob('conversations.json')) if path.is_dir() else [entry])
+    if not sources:
+        parser.error('no exports found')
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    failures = 0
+    with make_executor(min(args.workers or os.cpu_count() or 1, len(sources))) as executor:
+        futures = {
+            executor.submit(_process_export, source, str(out / name), args.format, not args.dataframe, args.all_branches): source
+            for source, name in zip(sources, _report_names(sources))
+        }
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Valid JSON of an unexpected shape fails anywhere in the pipeline;
+                # one bad export must not cost the others their reports
+                failures += 1
+                print(f'{source}: failed: {e}', file=sys.stderr)
+                continue
+            if result['report'] is None:
+                failures += 1
+                print(f'{source}: no user messages found', file=sys.stderr)
+            else:
+                print(f"{source}: {result['messages']} messages -> {result['report']} ({result['seconds']:.1f}s)")
+    return 1 if failures else 0
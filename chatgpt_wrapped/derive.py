@@ -0,0 +1,50 @@
+"""Per-message calendar columns and the labels used to display them.
+
+Calendar fields are stored as small integers (UTC, like ``pd.to_datetime(...,
+unit='s')``); names are only attached to the handful of aggregated values that
+reach the page.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+MONTH_NAMES = (
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+)
+SECONDS_PER_DAY = 86_400
+_EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+
+
+def add_calendar_columns(messages: pd.DataFrame) -> pd.DataFrame:
+    """Add ``day`` (days since epoch), ``hour``, ``weekday`` (0 = Monday),
+    ``month`` (1-12) and ``is_weekend`` derived from ``timestamp``."""
+    ts = messages['timestamp'].to_numpy(dtype=np.int64)
+    day = ts // SECONDS_PER_DAY
+    weekday = (day + _EPOCH_WEEKDAY) % 7
+    month = day.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+    return messages.assign(
+        day=day.astype(np.int32),
+        hour=((ts - day * SECONDS_PER_DAY) // 3600).astype(np.int8),
+        weekday=weekday.astype(np.int8),
+        month=month.astype(np.int8),
+        is_weekend=weekday >= 5,
+    )
+
+
+def day_name(weekday: int) -> str:
+    return DAY_NAMES[weekday]
+
+
+def month_name(month: int) -> str:
+    return MONTH_NAMES[month - 1]
+
+
+def with_dates(counts: pd.Series) -> pd.Series:
+    """Re-index a Series keyed by ``day`` (days since epoch) by calendar date."""
+    dates = pd.to_datetime(counts.index.to_numpy(dtype=np.int64), unit='D').date
+    return counts.set_axis(pd.Index(dates, name='date'))
+
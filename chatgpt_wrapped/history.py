@@ -0,0 +1,445 @@
+"""Per-user store of normalized conversations for incremental re-uploads.
+
+Users re-upload fresh exports that mostly repeat the previous one. The
+:class:`HistoryStore` keeps, per user, the normalized message table of the
+last upload and a fingerprint of every conversation: its ``conversation_id``,
+``update_time`` (a digest of its bytes for legacy conversations) and size in
+bytes. A new upload is read in two passes:
+
+1. a byte-level scan that finds the conversations and their fingerprints
+   without decoding any JSON;
+2. decoding and normalizing only the conversations whose fingerprint is not
+   in the store (in a process pool when the delta is large).
+
+Stored rows of unchanged conversations are merged with the new rows in the
+order of the upload, so the result is identical to a full parse and the work
+done in Python follows the size of the delta. A user is identified by the id
+of their oldest conversation, which every later export of the account repeats.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import IO, Callable
+
+import numpy as np
+import pandas as pd
+
+from chatgpt_wrapped.cache import CACHE_VERSION, ResponseCache, entries_on_disk, evict_lru, staged_dir
+from chatgpt_wrapped.parsing import (
+    CHUNK_SIZE,
+    SLICE_BYTES,
+    MessageColumns,
+    candidate_spans,
+    decode_elements,
+    iter_elements,
+    normalize_conversation,
+    open_export,
+    stream_size,
+)
+from chatgpt_wrapped.pipeline import MESSAGE_ROLES, PARALLEL_PARSE_BYTES, TEXT_ROLES, load_export
+
+# Share of the progress bar taken by the scan; the delta parse fills the rest
+SCAN_PROGRESS = 0.2
+USER_RESPONSE_CACHE_BYTES = 64 << 20
+
+# Top-level keys of a conversation, in the order the exporter writes them
+_HEADER = re.compile(
+    rb'{\s*"title"\s*:\s*(?:null|"(?:[^"\\]|\\.)*")\s*,'
+    rb'\s*"create_time"\s*:\s*(null|-?[\d.eE+-]+)\s*,'
+    rb'\s*"update_time"\s*:\s*(null|-?[\d.eE+-]+)\s*,'
+)
+_TAIL = re.compile(rb'"id"\s*:\s*"([^"\\]+)"\s*}')
+_TAIL_BYTES = 512
+# Legacy conversations (a ``messages`` list, no update_time) start with their id
+_LEGACY_HEADER = re.compile(rb'{\s*"id"\s*:\s*"([^"\\]+)"\s*,')
+
+
+class _NotIncremental(Exception):
+    """The upload cannot be merged with the store; it is parsed in full instead."""
+
+
+# ────────────────────────  Scan  ────────────────────────────────
+def _number(token: bytes) -> float | None:
+    return None if token == b'null' else float(token)
+
+
+def _fingerprint(segment: bytes) -> tuple[str | None, float | None]:
+    """``(fingerprint, create_time)`` of one conversation's raw bytes.
+
+    Both are ``None`` when the header or the closing ``id`` is not where the
+    exporter puts them; such conversations are parsed on every upload. A
+    legacy conversation has no ``update_time``, so a digest of its bytes
+    stands in for it, and no ``create_time``.
+    """
+    header = _HEADER.match(segment)
+    if header is None:
+        legacy = _LEGACY_HEADER.match(segment)
+        if legacy is None:
+            return None, None
+        digest = hashlib.blake2b(segment, digest_size=8).hexdigest()
+        return f"{legacy.group(1).decode('utf-8', 'replace')}|{digest}|{len(segment)}", None
+    tail = _TAIL.search(segment, max(0, len(segment) - _TAIL_BYTES))
+    if tail is None or tail.end() != len(segment):
+        return None, None
+    try:
+        created, updated = _number(header.group(1)), _number(header.group(2))
+    except ValueError:
+        return None, None
+    return f"{tail.group(1).decode('utf-8', 'replace')}|{updated!r}|{len(segment)}", created
+
+
+def _conversation_id(fingerprint: str) -> str:
+    return fingerprint.rsplit('|', 2)[0]
+
+
+def _split_conversations(segment: bytes) -> list[tuple[int, int]]:
+    """Byte ranges of the conversations in a segment that has no fingerprint.
+
+    Boundaries are only cut where the next conversation starts with the same
+    key as the first one, so a legacy conversation after mapping ones shares
+    their segment. The segment is cut again at every candidate and the pieces
+    are regrouped from one conversation header to the next.
+    """
+    groups = []
+    for start, end in candidate_spans(segment):
+        if groups and _HEADER.match(segment, start) is None and _LEGACY_HEADER.match(segment, start) is None:
+            groups[-1][1] = end
+        else:
+            groups.append([start, end])
+    return [tuple(group) for group in groups]
+
+
+def scan_export(
+    fp: IO,
+    progress: Callable[[float, int], None] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> list[tuple[int, int, str | None, float | None]]:
+    """Locate the conversations of an export without decoding them.
+
+    Returns ``(start, end, fingerprint, create_time)`` per conversation, as
+    byte offsets into the stream, from :func:`~chatgpt_wrapped.parsing.iter_elements`.
+    A false boundary inside a message splits one conversation into pieces
+    without fingerprints, which are always parsed together. Raises
+    ``ValueError`` for the legacy ``{"conversations": [...]}`` wrapper.
+    """
+    total_bytes = stream_size(fp)
+    segments = []
+    for start, segment in iter_elements(fp, chunk_size=chunk_size):
+        end = start + len(segment)
+        fingerprint, created = _fingerprint(segment)
+        if fingerprint is not None:
+            segments.append((start, end, fingerprint, created))
+            continue
+        for begin, stop in _split_conversations(segment):
+            segments.append((start + begin, start + stop, *_fingerprint(segment[begin:stop])))
+        if progress is not None:
+            progress(min(end / total_bytes, 1.0) if total_bytes else 0.0, len(segments))
+    return segments
+
+
+def user_key(segments: list[tuple[int, int, str | None, float | None]]) -> str | None:
+    """Store key of the account an export belongs to: a hash of its oldest conversation's id."""
+    dated = [(created, i) for i, (_, _, fingerprint, created) in enumerate(segments) if created is not None]
+    if not dated:
+        return None
+    conversation_id = segments[min(dated)[1]][2].rsplit('|', 2)[0]
+    return hashlib.sha256(conversation_id.encode('utf-8', 'surrogatepass')).hexdigest()[:32]
+
+
+# ────────────────────────  Delta parse  ─────────────────────────
+def _decode_run(text: str) -> list[dict] | None:
+    """Decode ``conversation, conversation, ...`` text; ``None`` if it ends mid-conversation."""
+    convos, rest = [], 0
+    for convo, rest in decode_elements(text):
+        convos.append(convo)
+    return None if text[rest:].strip() else convos
+
+
+def _normalize_batch(
+    data: bytes, bounds: list[tuple[int, int]], columns: MessageColumns, all_branches: bool = False,
+) -> tuple[MessageColumns, list[tuple[int, int, int, bool]]]:
+    """Worker entry point: normalize the segments at ``bounds`` (byte ranges into ``data``).
+
+    Fills ``columns``, an empty sink from the parent, and returns it with
+    ``(rows kept, messages seen, conversations, reusable)`` per segment; only
+    a segment that is exactly one conversation is reusable. A piece of a
+    conversation split at a false boundary is decoded together with the
+    following pieces, and the rows go to the first.
+    """
+    sizes = []
+    i = 0
+    while i < len(bounds):
+        j = i + 1
+        while True:
+            convos = _decode_run(data[bounds[i][0]:bounds[j - 1][1]].decode('utf-8'))
+            if convos is not None:
+                break
+            if j == len(bounds):
+                raise _NotIncremental('a conversation boundary was misdetected')
+            j += 1
+        rows, seen = len(columns), columns.seen
+        for convo in convos:
+            normalize_conversation(convo, columns, all_branches)
+        sizes.append((len(columns) - rows, columns.seen - seen, len(convos), j - i == 1 and len(convos) == 1))
+        sizes.extend([(0, 0, 0, False)] * (j - i - 1))
+        i = j
+    return columns, sizes
+
+
+def _plan_batches(segments: list, changed: np.ndarray, slice_bytes: int) -> list[tuple[int, int]]:
+    """Group changed conversations into ``(first, stop)`` index ranges of adjacent segments.
+
+    A range is only split before a segment with a fingerprint, i.e. a
+    confirmed conversation start, so pieces of one conversation stay together.
+    """
+    batches = []
+    first = None
+    for i in range(len(segments) + 1):
+        if i < len(segments) and changed[i]:
+            if first is None:
+                first = i
+            elif segments[i][2] is not None and segments[i][0] - segments[first][0] >= slice_bytes:
+                batches.append((first, i))
+                first = i
+        elif first is not None:
+            batches.append((first, i))
+            first = None
+    return batches
+
+
+def _read_ranges(fp: IO, ranges: list[tuple[int, int]], chunk_size: int = CHUNK_SIZE):
+    """Yield the bytes of each ``(start, end)`` range, in order, from one forward pass."""
+    position = 0
+    for start, end in ranges:
+        while position < start:
+            skipped = len(fp.read(min(chunk_size, start - position)))
+            if not skipped:
+                raise ValueError('Malformed export: the file changed while it was read')
+            position += skipped
+        data = fp.read(end - start)
+        position += len(data)
+        yield data
+
+
+# ────────────────────────  Store  ───────────────────────────────
+class HistoryStore:
+    """Directory of per-user message tables, merged with every new upload.
+
+    ``<directory>/<user>/data`` holds the table of the last upload and its
+    conversation fingerprints; ``<directory>/<user>/responses`` caches model
+    answers for that user's prompt chunks without expiry, so a re-upload only
+    pays for the chunks that changed. The least recently used users are
+    dropped once the directory grows past ``max_disk_bytes``.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_disk_bytes: int = 2 << 30):
+        self.directory = Path(directory)
+        self.max_disk_bytes = max_disk_bytes
+
+    def ingest(
+        self,
+        fp: IO,
+        progress: Callable[[float, int], None] | None = None,
+        executor: Executor | None = None,
+        parallel_bytes: int = PARALLEL_PARSE_BYTES,
+        all_branches: bool = False,
+    ) -> dict:
+        """Like :func:`~chatgpt_wrapped.pipeline.load_export`, parsing only what changed.
+
+        The result has an extra ``'delta'`` entry: ``{'user', 'conversations',
+        'reused', 'parsed', 'removed'}``, or ``None`` when the upload had to be
+        parsed in full without the store.
+        """
+        here = fp.tell()
+        try:
+            with open_export(fp) as stream:
+                scan_progress = None if progress is None else lambda f, n: progress(f * SCAN_PROGRESS, n)
+                segments = scan_export(stream, scan_progress)
+            user = user_key(segments)
+            if user is None:
+                raise _NotIncremental('no conversation has a recognizable header')
+            return self._merge(fp, here, user, segments, progress, executor, parallel_bytes, all_branches)
+        except (_NotIncremental, ValueError) as e:
+            # Includes malformed input: the full parse reports it properly
+            print(f"Console: Parsing the whole upload: {e}")
+            fp.seek(here)
+            return {**load_export(fp, progress, executor, parallel_bytes, all_branches), 'delta': None}
+
+    def responses(self, user: str) -> ResponseCache:
+        """Model answers for ``user``'s prompt chunks, kept until the user is evicted."""
+        return ResponseCache(self.directory / user / 'responses', ttl_seconds=float('inf'),
+                             max_disk_bytes=USER_RESPONSE_CACHE_BYTES)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # ────────────────────────  Merge  ───────────────────────────────
+    def _merge(self, fp, here, user, segments, progress, executor, parallel_bytes, all_branches) -> dict:
+        stored = self._load(user, all_branches)
+        index: dict[str, tuple[int, int, int]] = {}
+        if stored is not None:
+            starts = np.concatenate(([0], np.cumsum(stored['rows'])))
+            for i, fingerprint in enumerate(stored['fingerprints']):
+                if fingerprint is not None and fingerprint not in index:
+                    index[fingerprint] = (int(starts[i]), int(stored['rows'][i]), int(stored['seen'][i]))
+
+        n = len(segments)
+        fingerprints = [s[2] for s in segments]
+        reused = [index.get(f) if f is not None else None for f in fingerprints]
+        changed = np.array([r is None for r in reused], dtype=bool)
+        batches = _plan_batches(segments, changed, SLICE_BYTES)
+
+        # Per segment: source of its rows (stored table or delta) and sizes
+        from_store = ~changed
+        row_start = np.zeros(n, dtype=np.int64)
+        rows = np.zeros(n, dtype=np.int64)
+        seen = np.zeros(n, dtype=np.int64)
+        for i in np.flatnonzero(from_store):
+            row_start[i], rows[i], seen[i] = reused[i]
+
+        delta = MessageColumns(MESSAGE_ROLES, TEXT_ROLES)
+        parsed = 0
+        if batches:
+            fp.seek(here)
+            with open_export(fp) as stream:
+                ranges = [(segments[a][0], segments[b - 1][1]) for a, b in batches]
+                jobs = (
+                    (data, [(s - begin, e - begin) for s, e, _, _ in segments[a:b]])
+                    for (a, b), (begin, _), data in zip(batches, ranges, _read_ranges(stream, ranges))
+                )
+                delta_bytes = sum(end - begin for begin, end in ranges)
+                done_bytes = 0
+                results = self._parse_batches(jobs, delta, all_branches, executor, delta_bytes >= parallel_bytes)
+                for (a, b), (begin, end), (columns, sizes) in zip(batches, ranges, results):
+                    sizes = np.array(sizes, dtype=np.int64).reshape(-1, 4)
+                    rows[a:b], seen[a:b] = sizes[:, 0], sizes[:, 1]
+                    row_start[a:b] = len(delta) + np.cumsum(sizes[:, 0]) - sizes[:, 0]
+                    parsed += int(sizes[:, 2].sum())
+                    for i in np.flatnonzero(sizes[:, 3] == 0):
+                        fingerprints[a + i] = None
+                    delta.extend(columns)
+                    done_bytes += end - begin
+                    if progress is not None:
+                        progress(SCAN_PROGRESS + (1 - SCAN_PROGRESS) * done_bytes / delta_bytes, parsed)
+
+        df, conversation_ids = self._assemble(stored, delta, from_store, row_start, rows)
+        # Conversations of the stored upload that this one no longer has; edited ones are still there.
+        # Conversations split at a false boundary have no fingerprint, only ids in the table
+        present = {_conversation_id(s[2]) for s in segments if s[2] is not None} | set(conversation_ids)
+        previous = {_conversation_id(f) for f in index} | set(stored['ids'] if stored is not None else ())
+        removed = len(previous - present)
+        if stored is None or stored['fingerprints'] != fingerprints or not np.array_equal(stored['rows'], rows):
+            self._save(user, all_branches, df, conversation_ids, fingerprints, rows, seen)
+        if progress is not None:
+            progress(1.0, n)
+        return {
+            'df': df,
+            'conversation_ids': pd.Series(conversation_ids, name='conversation_id', dtype=object),
+            'total_convos': int(from_store.sum()) + parsed,
+            'messages_seen': int(seen.sum()),
+            'delta': {
+                'user': user,
+                'reused': int(from_store.sum()),
+                'parsed': parsed,
+                'removed': removed,
+            },
+        }
+
+    @staticmethod
+    def _parse_batches(jobs, sink: MessageColumns, all_branches: bool, executor: Executor | None, parallel: bool):
+        """Normalize ``(data, bounds)`` batches in order, across ``executor`` when ``parallel``."""
+        if executor is None or not parallel:
+            for data, bounds in jobs:
+                yield _normalize_batch(data, bounds, sink.like(), all_branches)
+            return
+        max_in_flight = 2 * (getattr(executor, '_max_workers', None) or os.cpu_count() or 1)
+        pending = []
+        try:
+            for data, bounds in jobs:
+                pending.append(executor.submit(_normalize_batch, data, bounds, sink.like(), all_branches))
+                if len(pending) >= max_in_flight:
+                    yield pending.pop(0).result()
+            while pending:
+                yield pending.pop(0).result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _assemble(stored, delta: MessageColumns, from_store, row_start, rows) -> tuple[pd.DataFrame, list]:
+        """Stored and new rows in upload order, with conversation codes as a full parse assigns them."""
+        delta_df = delta.to_frame()
+        frames, ids, code_offset = [], [], 0
+        source_offset = np.zeros(len(rows), dtype=np.int64)
+        if stored is not None and rows[from_store].sum():
+            frames.append(stored['df'])
+            ids = list(stored['ids'])
+            code_offset = len(ids)
+            source_offset[~from_store] = len(stored['df'])
+        if len(delta_df):
+            frames.append(delta_df.assign(conversation=delta_df['conversation'] + code_offset))
+        ids += delta.conversation_ids
+        if not frames:
+            return delta_df, []
+        combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+        starts = row_start + source_offset
+        total = int(rows.sum())
+        take = np.repeat(starts - (np.cumsum(rows) - rows), rows) + np.arange(total)
+        df = combined.take(take).reset_index(drop=True)
+        # One code per distinct id, numbered by first appearance like MessageColumns does
+        unified, unique_ids = pd.factorize(pd.Series(ids, dtype=object), use_na_sentinel=False)
+        codes, first = pd.factorize(unified[df['conversation'].to_numpy()])
+        df['conversation'] = codes.astype(np.int32)
+        return df, [unique_ids[i] for i in first]
+
+    # ────────────────────────  Disk  ────────────────────────────────
+    def _load(self, user: str, all_branches: bool) -> dict | None:
+        path = self.directory / user / 'data'
+        try:
+            meta = json.loads((path / 'meta.json').read_text())
+            if meta.get('version') != CACHE_VERSION or meta.get('all_branches') != all_branches:
+                return None
+            conversations = pd.read_parquet(path / 'conversations.parquet')
+            ids = pd.read_parquet(path / 'ids.parquet')['conversation_id']
+            stored = {
+                'df': pd.read_parquet(path / 'messages.parquet'),
+                'ids': [None if pd.isna(i) else i for i in ids.tolist()],
+                'fingerprints': [f if isinstance(f, str) else None for f in conversations['fingerprint'].tolist()],
+                'rows': conversations['rows'].to_numpy(dtype=np.int64),
+                'seen': conversations['seen'].to_numpy(dtype=np.int64),
+            }
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Console: Dropping unreadable history for {user}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        # Touch for LRU eviction
+        os.utime(path / 'meta.json')
+        return stored
+
+    def _save(self, user: str, all_branches: bool, df: pd.DataFrame, conversation_ids: list, fingerprints: list, rows, seen) -> None:
+        try:
+            # Published atomically so a concurrent upload never reads a half-written table
+            with staged_dir(self.directory / user / 'data') as tmp:
+                df.to_parquet(tmp / 'messages.parquet')
+                pd.DataFrame({'conversation_id': pd.Series(conversation_ids, dtype=object)}).to_parquet(tmp / 'ids.parquet')
+                pd.DataFrame({
+                    'fingerprint': pd.Series(fingerprints, dtype=object),
+                    'rows': rows,
+                    'seen': seen,
+                }).to_parquet(tmp / 'conversations.parquet')
+                (tmp / 'meta.json').write_text(json.dumps({'version': CACHE_VERSION, 'all_branches': all_branches, 'updated': time.time()}))
+            evict_lru(entries_on_disk(self.directory, stamp='data/meta.json'), self.max_disk_bytes)
+        except (OSError, ValueError, TypeError) as e:
+            # Only costs a full parse on the next upload
+            print(f"Console: Could not persist history for {user}: {e}")
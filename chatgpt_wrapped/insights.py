@@ -0,0 +1,375 @@
+"""Summarize a chat-history prompt into ``{"summary", "topics"}`` with an LLM.
+
+Short histories go to the model in one call. Longer ones are split on
+conversation boundaries into chunks that are summarized concurrently (map),
+after which the partial summaries and topic lists are merged into the final
+JSON (reduce). The model is any ``async generate(prompt, system_instruction)``
+callable, so the pipeline runs equally against Gemini, an HTTP endpoint or the
+local stub in :mod:`chatgpt_wrapped.stub_model`. Chunk boundaries are chosen
+by content, and :func:`cached_generate` caches every call, so a re-upload
+that changed a few conversations only re-summarizes the chunks holding them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+from collections import Counter
+from typing import Awaitable, Callable
+
+from chatgpt_wrapped.jobs import RequestLimitExceeded
+from chatgpt_wrapped.prompt import CHARS_PER_TOKEN
+
+Generate = Callable[[str, str], Awaitable[str]]
+
+
+class IncompleteSummary(RuntimeError):
+    """Some chunks could not be summarized; ``text`` covers only the others.
+
+    ``summarized`` of ``total`` chunks made it into ``text``. The result is
+    still worth showing but must not be cached as the summary of the whole
+    history.
+    """
+
+    def __init__(self, text: str, summarized: int, total: int):
+        super().__init__(f'{total - summarized} of {total} chunk summaries failed')
+        self.text = text
+        self.summarized = summarized
+        self.total = total
+
+
+DEFAULT_CHUNK_TOKENS = 30_000
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0  # seconds before the first retry, doubled per attempt
+DEFAULT_TIMEOUT = 120.0
+REDUCE_FAN_IN = 16  # partial summaries merged per reduce call
+CHUNK_CUT_ODDS = 8  # past half a chunk, 1 in CHUNK_CUT_ODDS conversations ends one
+
+_JSON_RULES = """
+CRITICAL: You must respond with ONLY valid JSON in exactly this format, with no additional text, markdown, or formatting:
+{
+    "summary": "Your 4 sentence summary here",
+    "topics": ["topic1", "topic2", "topic3", "topic4", "topic5", "topic6", "topic7", "topic8", "topic9", "topic10"]
+}
+
+IMPORTANT RULES:
+1. Start your response with { and end with }
+2. Use double quotes for all strings and keys
+3. Do not include any text before or after the JSON
+4. Do not use markdown formatting like ```json
+5. Ensure all strings are properly escaped
+6. The summary should be exactly 4 sentences
+7. The topics array should contain exactly 10 topics
+8. Do not include any comments or explanations
+9. Make sure all quotes are properly closed
+10. Use simple, clear topic names (1-3 words each)
+"""
+
+SYSTEM_INSTRUCTION = """
+You are a helpful assistant that is worldclass at parsing large amounts of data and deriving insights from them.
+You are going to be given a string of data that contains all the messages from a user's chat history with ChatGPT.
+You're task is to write a 4 sentence summary of the user based on the chat history and provide 10 the most prominent topics in the total chat history.
+Do not overemphasize recent topics, focus on the overall usage patterns and trends.
+""" + _JSON_RULES + """
+Example of valid response:
+{"summary": "This user frequently asks for help with programming and technical questions. They seem to be working on various software projects and learning new technologies. The user often requests code examples and explanations for complex concepts. They appear to be a developer or student interested in improving their technical skills.", "topics": ["programming", "code examples", "technical questions", "software development", "learning", "debugging", "algorithms", "web development", "data structures", "best practices"]}
+
+Do not include any other text, explanations, or formatting. Only the JSON object.
+"""
+
+MAP_INSTRUCTION = """
+You are a helpful assistant that is worldclass at parsing large amounts of data and deriving insights from them.
+You are going to be given ONE PART of a user's chat history with ChatGPT; other parts are summarized separately.
+Write a 4 sentence summary of what the user does in this part and list the 10 most prominent topics in it.
+""" + _JSON_RULES
+
+REDUCE_INSTRUCTION = """
+You are a helpful assistant that is worldclass at combining partial analyses into one.
+You are going to be given a JSON list of partial results, each summarizing one part of a user's chat history with ChatGPT.
+Parts cover similar amounts of history; weigh them equally and do not overemphasize any single part.
+Write a 4 sentence summary of the user as a whole and the 10 most prominent topics across all parts, merging near-duplicate topics.
+""" + _JSON_RULES
+
+
+def try_parse_json(text):
+    """Try to parse JSON with multiple strategies"""
+    strategies = [
+        # Strategy 1: Direct parsing
+        lambda t: json.loads(t),
+
+        # Strategy 2: Remove markdown code blocks
+        lambda t: json.loads(re.sub(r'```json\s*|```\s*', '', t).strip()),
+
+        # Strategy 3: Extract JSON with regex and clean
+        lambda t: json.loads(re.search(r'\{.*\}', t, re.DOTALL).group(0).strip()),
+
+        # Strategy 4: Fix quotes and try again
+        lambda t: json.loads(re.sub(r'```json\s*|```\s*', '', t).strip().replace("'", '"')),
+
+        # Strategy 5: More aggressive cleaning
+        lambda t: json.loads(re.sub(r'```json\s*|```\s*|^[^{]*|[^}]*$', '', t, flags=re.MULTILINE).strip()),
+    ]
+
+    for i, strategy in enumerate(strategies):
+        try:
+            result = strategy(text)
+            print(f"Console: JSON parsed successfully using strategy {i+1}")
+            return result
+        except Exception as e:
+            print(f"Console: Strategy {i+1} failed: {str(e)}")
+            continue
+
+    print("Console: All JSON parsing strategies failed")
+    return None
+
+
+# ────────────────────────  Chunking  ────────────────────────────
+def _is_cut(piece: str) -> bool:
+    digest = hashlib.blake2b(piece.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % CHUNK_CUT_ODDS == 0
+
+
+def split_prompt(prompt: str, chunk_tokens: int | None = DEFAULT_CHUNK_TOKENS) -> list[str]:
+    """Split a :func:`~chatgpt_wrapped.prompt.build_prompt` string into chunks.
+
+    Chunks end on conversation boundaries (blank lines) where possible; a
+    single conversation larger than a chunk is split between messages. Once a
+    chunk is half full, it ends after any conversation whose hash selects it,
+    so boundaries depend on nearby text only: inserting a conversation
+    changes its own chunk, and the following ones realign at the next
+    selected boundary. ``chunk_tokens=None`` (or 0) keeps the prompt whole.
+    """
+    limit = chunk_tokens * CHARS_PER_TOKEN if chunk_tokens else None
+    if limit is None or len(prompt) <= limit:
+        return [prompt] if prompt.strip() else []
+
+    pieces = []
+    for conversation in prompt.split('\n\n'):
+        if len(conversation) <= limit:
+            pieces.append(conversation)
+            continue
+        lines, size = [], 0
+        for line in conversation.split('\n'):
+            if lines and size + len(line) + 1 > limit:
+                pieces.append('\n'.join(lines))
+                lines, size = [], 0
+            lines.append(line[:limit])
+            size += len(line) + 1
+        if lines:
+            pieces.append('\n'.join(lines))
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) + 2 > limit:
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+        if size >= limit // 2 and _is_cut(piece):
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+    if current:
+        chunks.append('\n\n'.join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+# ────────────────────────  Map / reduce  ────────────────────────
+async def _call_with_retry(
+    generate: Generate,
+    prompt: str,
+    system_instruction: str,
+    semaphore: asyncio.Semaphore,
+    retries: int,
+    backoff: float,
+    timeout: float | None,
+) -> str:
+    """Call the model under ``semaphore``, retrying failures with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                text = await asyncio.wait_for(generate(prompt, system_instruction), timeout)
+            if not text or not text.strip():
+                raise ValueError('empty response')
+            return text.strip()
+        except Exception as e:
+            # The request cap already waited for a free slot; retrying would only wait again
+            if attempt == retries or isinstance(e, RequestLimitExceeded):
+                raise
+            delay = backoff * 2 ** attempt * (0.5 + random.random())
+            print(f"Console: Model call failed ({e}); retry {attempt + 1}/{retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def _as_partial(data) -> dict | None:
+    if not isinstance(data, dict):
+        return None
+    summary = data.get('summary')
+    topics = data.get('topics')
+    if not isinstance(summary, str) or not isinstance(topics, list):
+        return None
+    return {'summary': summary, 'topics': [str(t) for t in topics]}
+
+
+def merge_partials(partials: list[dict], max_topics: int = 10) -> dict:
+    """Combine partial results without a model call.
+
+    Topics are ranked by how many parts mention them (case-insensitively),
+    ties broken by first appearance; summaries are concatenated in order.
+    """
+    counts: Counter = Counter()
+    labels: dict[str, str] = {}
+    for partial in partials:
+        for topic in dict.fromkeys(t.strip() for t in partial['topics'] if t.strip()):
+            key = topic.lower()
+            labels.setdefault(key, topic)
+            counts[key] += 1
+    # Counter.most_common is stable, so ties keep insertion order
+    topics = [labels[key] for key, _ in counts.most_common(max_topics)]
+    summary = ' '.join(p['summary'].strip() for p in partials if p['summary'].strip())
+    return {'summary': summary, 'topics': topics}
+
+
+async def _reduce(partials: list[dict], call: Callable[[str, str], Awaitable[str]], fan_in: int) -> dict:
+    """Merge partials with the model, ``fan_in`` at a time, until one remains."""
+    while len(partials) > 1:
+        groups = [partials[i:i + fan_in] for i in range(0, len(partials), fan_in)]
+
+        async def reduce_group(group: list[dict]) -> dict:
+            if len(group) == 1:
+                return group[0]
+            try:
+                text = await call(json.dumps(group), REDUCE_INSTRUCTION)
+                merged = _as_partial(try_parse_json(text))
+            except Exception as e:
+                print(f"Console: Reduce call failed: {e}")
+                merged = None
+            if merged is None:
+                print("Console: Merging partial summaries locally")
+                merged = merge_partials(group)
+            return merged
+
+        partials = list(await asyncio.gather(*(reduce_group(g) for g in groups)))
+    return partials[0]
+
+
+async def summarize_history(
+    prompt: str,
+    generate: Generate,
+    chunk_tokens: int | None = DEFAULT_CHUNK_TOKENS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    timeout: float | None = DEFAULT_TIMEOUT,
+    fan_in: int = REDUCE_FAN_IN,
+) -> str:
+    """Return the model's JSON answer (as text) for the whole history in ``prompt``.
+
+    A prompt that fits one chunk is sent as-is with :data:`SYSTEM_INSTRUCTION`.
+    Otherwise every chunk is summarized concurrently (at most ``concurrency``
+    calls in flight) and the results are merged. Raises if no chunk could be
+    summarized, and :class:`IncompleteSummary` with the merge of the others if
+    some chunks still fail after ``retries``. A chunk refused by the request
+    cap fails the whole summary with
+    :class:`~chatgpt_wrapped.jobs.RequestLimitExceeded`.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def call(text: str, system_instruction: str) -> str:
+        return await _call_with_retry(generate, text, system_instruction, semaphore, retries, backoff, timeout)
+
+    chunks = split_prompt(prompt, chunk_tokens)
+    if len(chunks) <= 1:
+        return await call(prompt, SYSTEM_INSTRUCTION)
+
+    print(f"Console: Summarizing {len(chunks)} chunks with up to {concurrency} concurrent calls")
+    results = await asyncio.gather(*(call(chunk, MAP_INSTRUCTION) for chunk in chunks), return_exceptions=True)
+    # Out of requests: a summary of the chunks that got through would pass for the whole history
+    for result in results:
+        if isinstance(result, RequestLimitExceeded):
+            raise result
+    partials = []
+    for i, result in enumerate(results):
+        partial = None if isinstance(result, BaseException) else _as_partial(try_parse_json(result))
+        if partial is None:
+            print(f"Console: Dropping chunk {i + 1}/{len(chunks)}: {result if isinstance(result, BaseException) else 'unparseable response'}")
+            continue
+        partials.append(partial)
+    if not partials:
+        raise RuntimeError(f'all {len(chunks)} chunk summaries failed')
+    text = json.dumps(await _reduce(partials, call, max(2, fan_in)))
+    if len(partials) < len(chunks):
+        raise IncompleteSummary(text, len(partials), len(chunks))
+    return text
+
+
+def cached_generate(generate: Generate, cache, model_id: str, params: dict) -> Generate:
+    """Wrap ``generate`` so each distinct call is answered once from ``cache``.
+
+    ``cache`` is a :class:`~chatgpt_wrapped.cache.ResponseCache`; entries are
+    keyed by ``model_id``, ``params``, the system instruction and the prompt.
+    Chunk summaries are cached one by one, so unchanged chunks of a grown
+    history cost no model call. Only answers holding JSON are kept.
+    """
+
+    async def generate_cached(prompt: str, system_instruction: str) -> str:
+        key = cache.key(model_id, {**params, 'system_instruction': system_instruction}, prompt)
+        cached = cache.get_json(key)
+        if cached is not None:
+            return cached['text']
+        text = await generate(prompt, system_instruction)
+        if text and try_parse_json(text) is not None:
+            cache.put_json(key, {'text': text})
+        return text
+
+    return generate_cached
+
+
+def summarize_history_sync(prompt: str, generate: Generate, **options) -> str:
+    """Run :func:`summarize_history` from synchronous code such as a Streamlit script."""
+    return asyncio.run(summarize_history(prompt, generate, **options))
+
+
+# ────────────────────────  Model adapters  ──────────────────────
+def gemini_generate(model_name: str = 'gemini-1.5-flash', temperature: float = 0.1) -> Generate:
+    """Adapter for ``google.generativeai``; call ``genai.configure`` first."""
+    import google.generativeai as genai
+
+    models: dict[str, object] = {}
+
+    async def generate(prompt: str, system_instruction: str) -> str:
+        model = models.get(system_instruction)
+        if model is None:
+            model = models[system_instruction] = genai.GenerativeModel(
+                model_name=model_name,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=temperature,  # Low temperature for more deterministic output
+                ),
+                system_instruction=system_instruction,
+            )
+        response = await model.generate_content_async(prompt)
+        return response.text
+
+    return generate
+
+
+def http_generate(url: str, timeout: float = DEFAULT_TIMEOUT) -> Generate:
+    """Adapter for a plain HTTP endpoint such as :mod:`chatgpt_wrapped.stub_model`.
+
+    POSTs ``{"prompt", "system_instruction"}`` as JSON and expects ``{"text"}``
+    back. Requests run in worker threads so calls overlap.
+    """
+    import requests
+
+    def post(prompt: str, system_instruction: str) -> str:
+        response = requests.post(url, json={'prompt': prompt, 'system_instruction': system_instruction}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()['text']
+
+    async def generate(prompt: str, system_instruction: str) -> str:
+        return await asyncio.to_thread(post, prompt, system_instruction)
+
+    return generate
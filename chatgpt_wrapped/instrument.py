@@ -0,0 +1,151 @@
+"""Lightweight per-stage instrumentation: wall time, CPU time and peak RSS.
+
+One :class:`Instrumentation` collects a record per pipeline stage or external
+API call; records are plain dicts so they can be shown as a table or exported
+as JSON. Memory figures come from ``/proc`` where available and are
+process-wide, so stages of concurrent sessions in one server overlap. Without
+the ``resource`` module (Windows) they are ``None``.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+_PAGE_MB = resource.getpagesize() / (1 << 20) if resource is not None else None
+
+
+def current_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process, since start or the last :func:`reset_peak_rss`."""
+    if resource is None:
+        return None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS; it cannot be reset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak-RSS counter (Linux only); return whether it worked."""
+    if resource is None:
+        return False
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def throttle(callback: Callable[..., None], interval: float = 0.25) -> Callable[..., None]:
+    """Wrap ``callback`` so it runs at most once every ``interval`` seconds.
+
+    Calls in between are dropped, except one whose first argument is ``>= 1.0``
+    (a finished progress fraction), which always goes through.
+    """
+    last = -float('inf')
+
+    def throttled(*args) -> None:
+        nonlocal last
+        now = time.monotonic()
+        if now - last >= interval or (args and args[0] >= 1.0):
+            last = now
+            callback(*args)
+
+    return throttled
+
+
+class Instrumentation:
+    """Collects ``{'name', 'kind', 'wall_s', 'cpu_s', 'rss_peak_mb', ...}`` records.
+
+    ``cpu_s`` is the CPU time of the whole process (all threads, not worker
+    processes) during the stage. Nested stages share the outer stage's peak-RSS
+    window.
+    """
+
+    def __init__(self):
+        self.records: list[dict] = []
+        self._lock = threading.Lock()
+        self._depth = 0
+
+    @contextmanager
+    def stage(self, name: str, kind: str = 'stage', **details) -> Iterator[dict]:
+        """Time the ``with`` block; the yielded record may be annotated by the caller."""
+        record = {'name': name, 'kind': kind, **details}
+        with self._lock:
+            if self._depth == 0:
+                reset_peak_rss()
+            record['depth'] = self._depth
+            self._depth += 1
+            # Listed in start order; the timings are filled in on exit
+            self.records.append(record)
+        rss_before = current_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            record['rss_peak_mb'] = peak_rss_mb()
+            rss_after = current_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                record['rss_delta_mb'] = rss_after - rss_before
+            with self._lock:
+                self._depth -= 1
+
+    def wrap_async(self, fn: Callable[..., Awaitable], name: str, kind: str = 'api') -> Callable[..., Awaitable]:
+        """Record every call of the coroutine function ``fn``; calls may overlap.
+
+        Only wall time is recorded, as CPU time and RSS of overlapping calls
+        cannot be told apart.
+        """
+        async def wrapper(*args, **kwargs):
+            record = {'name': name, 'kind': kind, 'depth': self._depth}
+            with self._lock:
+                self.records.append(record)
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException as e:
+                record['error'] = type(e).__name__
+                raise
+            finally:
+                record['wall_s'] = time.perf_counter() - started
+
+        return wrapper
+
+    def total_wall_s(self) -> float:
+        """Wall time of the finished top-level stages."""
+        return sum(r.get('wall_s', 0.0) for r in self.records if r['kind'] == 'stage' and r['depth'] == 0)
+
+    def to_json(self, indent: int | None = 2, **metadata) -> str:
+        return json.dumps({**metadata, 'records': self.records}, indent=indent)
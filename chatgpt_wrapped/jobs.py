@@ -0,0 +1,145 @@
+"""Background execution and a global request cap for the slow external calls.
+
+Streamlit runs a session's script top to bottom, so a model call made inline
+holds up everything rendered after it. :class:`JobQueue` runs such calls on
+one bounded thread pool shared by every session. The page submits a job,
+renders the rest and polls the returned future. A job submitted while an
+identical one (same key) is queued or running shares that job's future.
+:class:`RateLimiter` caps the API requests of all sessions together in a
+sliding window; this is what enforces the app's ``REQUEST_LIMIT``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PENDING = 32
+DEFAULT_MAX_WAIT = 30.0  # seconds a call may wait for a free request slot
+
+
+class RequestLimitExceeded(RuntimeError):
+    """No request slot frees up within the allowed wait."""
+
+
+class QueueFull(RuntimeError):
+    """The job queue already holds its maximum number of jobs."""
+
+
+class RateLimiter:
+    """At most ``limit`` requests per sliding ``window`` seconds, across threads.
+
+    A ``limit`` of 0 or less disables the cap.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._sleep = sleep
+        self._granted: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._granted and self._granted[0] <= now - self.window:
+            self._granted.popleft()
+
+    def acquire(self, max_wait: float = 0.0) -> None:
+        """Take a request slot, sleeping up to ``max_wait`` seconds for one to free up.
+
+        Raises :class:`RequestLimitExceeded` when no slot frees up in time;
+        the caller must not make the request then.
+        """
+        if self.limit <= 0:
+            return
+        deadline = self._clock() + max_wait
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._expire(now)
+                if len(self._granted) < self.limit:
+                    self._granted.append(now)
+                    return
+                free_at = self._granted[0] + self.window
+            if free_at > deadline:
+                raise RequestLimitExceeded(
+                    f'{self.limit} requests per {self.window:g}s used up; next slot in {free_at - now:.0f}s'
+                )
+            self._sleep(free_at - now)
+
+    def remaining(self) -> int | None:
+        """Requests left in the current window (None without a cap)."""
+        if self.limit <= 0:
+            return None
+        with self._lock:
+            self._expire(self._clock())
+            return self.limit - len(self._granted)
+
+    def wrap_async(self, fn: Callable[..., Awaitable], max_wait: float = DEFAULT_MAX_WAIT) -> Callable[..., Awaitable]:
+        """Coroutine function that takes a slot before every call of ``fn``."""
+        async def limited(*args, **kwargs):
+            # Waiting for a slot sleeps, so it happens off the event loop
+            await asyncio.to_thread(self.acquire, max_wait)
+            return await fn(*args, **kwargs)
+
+        return limited
+
+
+class JobQueue:
+    """Bounded thread pool with de-duplication of identical queued or running jobs.
+
+    At most ``workers`` jobs run at once and at most ``max_pending`` are
+    queued or running; :meth:`submit` raises :class:`QueueFull` beyond that.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING):
+        self.max_pending = max(1, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='job')
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.shared = 0
+        self.rejected = 0
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        """Run ``fn(*args, **kwargs)`` in the pool, or join the pending job with the same ``key``."""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f'{len(self._pending)} jobs already pending')
+            future = self._pending[key] = self._executor.submit(fn, *args, **kwargs)
+            self.submitted += 1
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'submitted': self.submitted,
+                'shared': self.shared,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,704 @@
+"""Streaming reader and normalizer for ChatGPT ``conversations.json`` exports.
+
+The export is a single JSON array that can reach several gigabytes. Instead of
+``json.load``-ing the whole tree, :func:`iter_conversations` decodes one
+top-level conversation at a time and :func:`parse_export` writes the normalized
+messages straight into :class:`MessageColumns`, so peak memory follows the rows
+kept rather than the size of the file.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import math
+import multiprocessing
+import os
+import posixpath
+import re
+import zipfile
+import zlib
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import IO, Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 1 << 20  # 1 MiB of text per read
+_WHITESPACE = ' \t\n\r'
+_DECODER = json.JSONDecoder()
+# Errors this close to the end of the decoded text may just be a cut-off value
+_TRUNCATION_WINDOW = 16
+
+
+# ────────────────────────  Incremental JSON reader  ─────────────
+class _TextStream:
+    """Buffered text view over a binary or text file object."""
+
+    def __init__(self, fp: IO, chunk_size: int = CHUNK_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buf = ''
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def fill(self, min_chars: int = 0) -> bool:
+        """Append at least one chunk (or ``min_chars``) to the buffer; False at EOF."""
+        if self.eof:
+            return False
+        # Drop the consumed prefix so the buffer only holds the current value.
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        target = len(self.buf) + max(min_chars, 1)
+        while len(self.buf) < target:
+            chunk = self._fp.read(self._chunk_size)
+            if not chunk:
+                self.buf += self._decoder.decode(b'', final=True)
+                self.eof = True
+                break
+            if isinstance(chunk, bytes):
+                self.bytes_read += len(chunk)
+                self.buf += self._decoder.decode(chunk)
+            else:
+                self.bytes_read += len(chunk.encode('utf-8'))
+                self.buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f'Malformed export: expected {char!r} at byte ~{self.bytes_read}')
+        self.pos += 1
+
+    def decode_value(self):
+        """Decode one JSON value at the cursor, reading more text as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Only a value cut off by the buffer edge is worth reading more text for
+                if not _is_truncation(e):
+                    raise ValueError(f'Malformed export: {e.msg} before byte ~{self.bytes_read}') from e
+                value, end = None, -1
+            # A value that ends exactly at the buffer edge may be truncated
+            # (e.g. a number), so only accept it once more text follows.
+            if end != -1 and (end < len(self.buf) or self.eof):
+                self.pos = end
+                return value
+            # Grow geometrically so a huge conversation is re-scanned O(log n) times.
+            if not self.fill(min_chars=len(self.buf) - self.pos):
+                if end != -1:
+                    self.pos = end
+                    return value
+                raise ValueError('Malformed export: truncated or invalid JSON')
+
+
+def _iter_array(stream: _TextStream) -> Iterator:
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.pos += 1
+        return
+    while True:
+        yield stream.decode_value()
+        sep = stream.peek()
+        stream.pos += 1
+        if sep == ']':
+            return
+        if sep != ',':
+            raise ValueError('Malformed export: expected "," or "]" between conversations')
+
+
+def iter_conversations(fp: IO, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Yield conversations one at a time from an export file object.
+
+    Accepts the current format (a top-level array of conversations) and the
+    legacy ``{"conversations": [...]}`` wrapper. Other top-level keys of the
+    legacy wrapper are decoded and discarded one value at a time.
+    """
+    yield from _iter_export(_TextStream(fp, chunk_size))
+
+
+def _iter_export(stream: _TextStream) -> Iterator[dict]:
+    first = stream.peek()
+    if first == '[':
+        yield from _iter_array(stream)
+        return
+    if first != '{':
+        raise ValueError('Malformed export: expected a JSON array or object')
+
+    stream.pos += 1
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.decode_value()
+        stream.expect(':')
+        if key == 'conversations' and stream.peek() == '[':
+            yield from _iter_array(stream)
+        else:
+            stream.decode_value()
+        sep = stream.peek()
+        stream.pos += 1
+        if sep == '}':
+            return
+        if sep != ',':
+            raise ValueError('Malformed export: expected "," or "}" in export object')
+
+
+# ────────────────────────  Normalization  ───────────────────────
+def _node_id(value) -> str | None:
+    return value if isinstance(value, str) else None
+
+
+def _depth_first(mapping: dict) -> Iterator[dict]:
+    """Every node of a ``mapping`` tree, depth-first from the roots, children in listed order."""
+    visited = set()
+    stack = [node_id for node_id, node in reversed(mapping.items())
+             if not isinstance(node, dict) or _node_id(node.get('parent')) not in mapping]
+    while stack:
+        node_id = stack.pop()
+        if node_id in visited:
+            continue
+        visited.add(node_id)
+        node = mapping.get(node_id)
+        if not isinstance(node, dict):
+            continue
+        yield node
+        children = node.get('children')
+        if isinstance(children, list):
+            stack.extend(c for c in reversed(children) if _node_id(c) in mapping and c not in visited)
+    # Nodes only reachable through a cycle
+    for node_id, node in mapping.items():
+        if node_id not in visited and isinstance(node, dict):
+            yield node
+
+
+def _active_branch(mapping: dict, current_node: str) -> list[dict]:
+    """Nodes from the root down to ``current_node``, found by following ``parent`` links."""
+    path = []
+    visited = set()
+    node_id = current_node
+    while node_id is not None and node_id not in visited:
+        node = mapping.get(node_id)
+        if not isinstance(node, dict):
+            break
+        visited.add(node_id)
+        path.append(node)
+        node_id = _node_id(node.get('parent'))
+    path.reverse()
+    return path
+
+
+def extract_messages(convo: dict, all_branches: bool = False) -> Iterator[tuple[str, str, float]]:
+    """Yield ``(role, content, timestamp)`` for every timestamped message in a conversation.
+
+    In ``mapping`` trees only the branch the user last saw is read, from the
+    root to ``current_node``; prompts that were edited and answers that were
+    regenerated are skipped. ``all_branches=True`` reads every node instead,
+    depth-first, as does a tree without a usable ``current_node``. Both
+    walks are iterative and O(nodes).
+    """
+    # Handle the new mapping structure
+    if 'mapping' in convo and isinstance(convo['mapping'], dict):
+        mapping = convo['mapping']
+        current_node = _node_id(convo.get('current_node'))
+        if all_branches or current_node not in mapping:
+            nodes = _depth_first(mapping)
+        else:
+            nodes = _active_branch(mapping, current_node)
+        messages: Iterable = (
+            node['message'] for node in nodes
+            if node.get('message') and isinstance(node['message'], dict)
+        )
+    else:
+        # Fallback for old format
+        messages = convo.get('messages', [])
+
+    for m in messages:
+        if not isinstance(m, dict):
+            continue
+
+        role = (
+            m.get('author', {}).get('role') if 'author' in m else m.get('role', '')
+        )
+
+        # More robust content extraction for new format
+        content = ''
+        if m.get('content') and isinstance(m.get('content'), dict):
+            content_obj = m.get('content', {})
+            if content_obj.get('content_type') == 'text' and content_obj.get('parts'):
+                content = content_obj.get('parts', [''])[0] or ''
+            elif isinstance(content_obj.get('text'), str):
+                content = content_obj.get('text', '')
+        elif m.get('text'):
+            content = m.get('text')
+        elif m.get('message') and isinstance(m.get('message'), dict):
+            message_content = m.get('message', {}).get('content', {})
+            if isinstance(message_content, dict) and message_content.get('parts'):
+                content = message_content.get('parts', [''])[0] or ''
+            elif isinstance(message_content, str):
+                content = message_content
+        elif isinstance(m.get('content'), str):
+            content = m.get('content', '')
+
+        ts = m.get('create_time') or m.get('timestamp')
+        if ts is None:
+            continue
+        yield role, content, float(ts)
+
+
+def normalize_conversation(convo: dict, sink, all_branches: bool = False) -> int:
+    """Append every message of ``convo`` to ``sink``; return the number of messages seen.
+
+    ``all_branches`` is passed to :func:`extract_messages`.
+    """
+    if not isinstance(convo, dict):
+        return 0
+    convo_id = convo.get('id') or convo.get('conversation_id')
+    n = 0
+    for role, content, ts in extract_messages(convo, all_branches):
+        sink.append(convo_id, role, content, ts)
+        n += 1
+    return n
+
+
+class MessageColumns:
+    """Column-oriented buffers for normalized messages.
+
+    Conversation ids and roles are dictionary-encoded while parsing, and
+    timestamps are kept as whole epoch seconds, so the buffers hold a few
+    machine words per message plus the content string. Word counts are taken
+    while the content is at hand (``-1`` for non-text content). ``conversation_ids``
+    maps conversation codes back to the export's ids.
+
+    ``keep_roles`` restricts which authors are stored (``None`` keeps all), and
+    ``text_roles`` whose content is stored (``None`` for every kept role), so
+    the assistant replies can be timed without holding their text.
+    ``seen`` counts every appended message, kept or not.
+    """
+
+    def __init__(self, keep_roles: Iterable[str] | None = None, text_roles: Iterable[str] | None = None):
+        self.keep_roles = frozenset(keep_roles) if keep_roles is not None else None
+        self.text_roles = frozenset(text_roles) if text_roles is not None else None
+        self.conversation = array('i')
+        self.role = array('b')
+        self.content: list[str | None] = []
+        self.timestamp = array('q')
+        self.word_count = array('i')
+        self.conversation_ids: list = []
+        self.role_labels: list[str] = []
+        self._conversation_codes: dict = {}
+        self._role_codes: dict = {}
+        self.seen = 0
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def like(self) -> MessageColumns:
+        """An empty sink with the same settings, e.g. for a worker to fill."""
+        return MessageColumns(self.keep_roles, self.text_roles)
+
+    def _conversation_code(self, conversation_id) -> int:
+        code = self._conversation_codes.get(conversation_id)
+        if code is None:
+            code = self._conversation_codes[conversation_id] = len(self.conversation_ids)
+            self.conversation_ids.append(conversation_id)
+        return code
+
+    def _role_code(self, role) -> int:
+        if role is None:
+            return -1
+        code = self._role_codes.get(role)
+        if code is None:
+            code = self._role_codes[role] = len(self.role_labels)
+            self.role_labels.append(role)
+        return code
+
+    def append(self, conversation_id, role, content, timestamp: float) -> None:
+        self.seen += 1
+        if self.keep_roles is not None and role not in self.keep_roles:
+            return
+        self.conversation.append(self._conversation_code(conversation_id))
+        self.role.append(self._role_code(role))
+        if isinstance(content, str) and (self.text_roles is None or role in self.text_roles):
+            self.content.append(content)
+            self.word_count.append(len(content.split()))
+        else:
+            self.content.append(None)
+            self.word_count.append(-1)
+        self.timestamp.append(math.floor(timestamp))
+
+    def extend(self, other: MessageColumns) -> None:
+        """Append all rows of ``other`` (e.g. a chunk normalized in a worker)."""
+        self.seen += other.seen
+        conversation_map = [self._conversation_code(c) for c in other.conversation_ids]
+        role_map = [self._role_code(r) for r in other.role_labels]
+        self.conversation.extend(conversation_map[c] for c in other.conversation)
+        self.role.extend(role_map[r] if r >= 0 else -1 for r in other.role)
+        self.content.extend(other.content)
+        self.timestamp.extend(other.timestamp)
+        self.word_count.extend(other.word_count)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Build the compact message table.
+
+        Columns: ``conversation`` (int32 code into :meth:`conversation_index`),
+        ``role`` (categorical), ``content`` (Arrow-backed string),
+        ``timestamp`` (int64 epoch seconds) and ``word_count`` (nullable Int32).
+        """
+        word_count = np.frombuffer(self.word_count, dtype=np.int32)
+        return pd.DataFrame({
+            'conversation': np.frombuffer(self.conversation, dtype=np.int32).copy(),
+            'role': pd.Categorical.from_codes(np.frombuffer(self.role, dtype=np.int8), self.role_labels),
+            'content': pd.array(self.content, dtype=pd.StringDtype('pyarrow')),
+            'timestamp': np.frombuffer(self.timestamp, dtype=np.int64).copy(),
+            'word_count': pd.arrays.IntegerArray(word_count.copy(), word_count < 0),
+        })
+
+    def conversation_index(self) -> pd.Series:
+        """Lookup table from conversation code to the export's conversation id."""
+        return pd.Series(self.conversation_ids, name='conversation_id', dtype=object)
+
+
+def stream_size(fp: IO) -> int | None:
+    """Bytes left in ``fp`` from its current position, or ``None`` if unknown."""
+    size = getattr(fp, 'size', None)
+    if size:
+        return size
+    try:
+        here = fp.tell()
+        end = fp.seek(0, 2)
+        fp.seek(here)
+        return end - here
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+# ────────────────────────  Export archives  ─────────────────────
+EXPORT_MEMBER = 'conversations.json'
+_ZIP_MAGIC = b'PK\x03\x04'
+
+
+def is_zip(fp: IO) -> bool:
+    """Whether ``fp`` starts like a zip archive; the position is left unchanged."""
+    here = fp.tell()
+    head = fp.read(len(_ZIP_MAGIC))
+    fp.seek(here)
+    return head == _ZIP_MAGIC
+
+
+@contextmanager
+def open_export(fp: IO) -> Iterator[IO]:
+    """Yield ``fp`` itself, or the ``conversations.json`` inside an export zip.
+
+    The archive member is decompressed on the fly as the parser reads it, so
+    the uncompressed JSON is never written to disk or held in memory as a
+    whole. The shallowest ``conversations.json`` in the archive is used.
+    Raises ``ValueError`` if the archive is damaged or has no such member.
+    """
+    if not is_zip(fp):
+        yield fp
+        return
+    try:
+        with zipfile.ZipFile(fp) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir() and posixpath.basename(info.filename) == EXPORT_MEMBER
+            ]
+            if not members:
+                raise ValueError(f'The archive does not contain {EXPORT_MEMBER}')
+            info = min(members, key=lambda i: (i.filename.count('/'), i.filename))
+            if info.flag_bits & 0x1:
+                raise ValueError(f'{info.filename} is encrypted')
+            try:
+                member = archive.open(info)
+            except NotImplementedError as e:
+                raise ValueError(f'Could not read the export archive: {e}') from None
+            with member:
+                # The zip reader knows the uncompressed size but does not
+                # expose it, and seeking to the end would inflate everything
+                member.size = info.file_size
+                yield member
+    except (zipfile.BadZipFile, zlib.error) as e:
+        raise ValueError(f'Could not read the export archive: {e}') from None
+
+
+def parse_export(
+    fp: IO,
+    sink=None,
+    progress: Callable[[float, int], None] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    all_branches: bool = False,
+):
+    """Stream an export into ``sink`` and return ``(sink, n_conversations)``.
+
+    ``progress`` is called after each conversation with the fraction of input
+    bytes consumed (0.0 when the size is unknown) and the running count.
+    ``all_branches`` is passed to :func:`extract_messages`.
+    """
+    if sink is None:
+        sink = MessageColumns()
+    total_bytes = stream_size(fp)
+    stream = _TextStream(fp, chunk_size)
+    n_convos = 0
+    for convo in _iter_export(stream):
+        normalize_conversation(convo, sink, all_branches)
+        n_convos += 1
+        if progress is not None:
+            fraction = min(stream.bytes_read / total_bytes, 1.0) if total_bytes else 0.0
+            progress(fraction, n_convos)
+    return sink, n_convos
+
+
+# ────────────────────────  Parallel normalization  ──────────────
+# Splitting the stream by walking brackets in Python is slower than letting the
+# C JSON decoder do it, so the parent process only cuts the raw bytes at
+# candidate conversation boundaries ('}, {"title"') and workers decode the
+# slices. An unescaped quote cannot occur inside a JSON string, so a candidate
+# is always structural, but it can still land inside a conversation (e.g.
+# between two citations). The worker then hands back the undecodable tail,
+# which the parent prepends to the next slice.
+SLICE_BYTES = 4 << 20
+# A run this far past its minimum size without a candidate for the first
+# element's key (e.g. a legacy first conversation that starts with "id")
+# accepts any '}, {"' instead, so the whole file is never buffered
+KEYED_CUT_BYTES = 8 << 20
+_FIRST_KEY = re.compile(rb'\s*{\s*"([^"\\]*)"')
+_SKIP_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_SKIP_WHITESPACE_BYTES = re.compile(rb'[ \t\n\r]*')
+
+
+def _candidate_cut(first_key: bytes | None) -> re.Pattern:
+    # Conversations all start with the same key, which nested objects rarely do
+    key = re.escape(first_key) if first_key is not None else rb'[^"\\]*'
+    return re.compile(rb'}\s*,\s*({\s*"' + key + rb'")')
+
+
+_ANY_CUT = _candidate_cut(None)
+
+
+def _is_truncation(error: json.JSONDecodeError) -> bool:
+    """Whether ``error`` may only mean the text stops early, not that it is invalid."""
+    # A cut literal or escape (``-Infinity``, ``\\uXXXX``) fails where it starts,
+    # a few characters before the end of the text
+    return error.pos >= len(error.doc) - _TRUNCATION_WINDOW or error.msg.startswith('Unterminated string')
+
+
+def iter_elements(fp: IO, min_bytes: int = 0, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[int, bytes]]:
+    """Cut a top-level JSON array into raw ``element, element, ...`` runs without decoding it.
+
+    Yields ``(offset, run)`` with the byte offset of the run in the stream.
+    A run ends at the first candidate boundary at least ``min_bytes`` past its
+    start, so by default every run is one element. A candidate inside an
+    element splits it over consecutive runs; :func:`decode_elements` reports
+    such a run as cut off. Candidates must repeat the first element's first
+    key until a run goes :data:`KEYED_CUT_BYTES` without one; from then on
+    any key will do. Raises ``ValueError`` if the stream is not an array.
+    """
+    buf = bytearray()
+    while True:
+        chunk = fp.read(chunk_size)
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        eof = not chunk
+        buf += chunk
+        body = buf.lstrip(codecs.BOM_UTF8).lstrip()
+        if not body and not eof:
+            continue
+        if not body.startswith(b'['):
+            raise ValueError('Malformed export: not a top-level JSON array')
+        first_key = _FIRST_KEY.match(body, 1)
+        if first_key is None and not eof and len(body) < chunk_size:
+            continue
+        break
+    cut = _candidate_cut(first_key.group(1)) if first_key else _ANY_CUT
+
+    offset = 0  # stream offset of buf[0]
+    pos = search_from = len(buf) - len(body) + 1
+    while True:
+        pos = _SKIP_WHITESPACE_BYTES.match(buf, pos).end()
+        match = cut.search(buf, max(search_from, pos + max(min_bytes, 1)))
+        if match is not None:
+            yield offset + pos, bytes(buf[pos:match.start() + 1])
+            pos = search_from = match.start(1)
+            continue
+        if cut is not _ANY_CUT and len(buf) - pos > min_bytes + KEYED_CUT_BYTES:
+            # The elements do not share their first key; rescan the run for any candidate
+            cut, search_from = _ANY_CUT, 0
+            continue
+        if eof:
+            tail = bytes(buf[pos:]).rstrip()
+            if not tail.endswith(b']'):
+                raise ValueError('Malformed export: truncated or invalid JSON')
+            run = tail[:-1].rstrip()
+            if run:
+                yield offset + pos, run
+            return
+        # Keep only the current run; rescan just the tail a new chunk can complete
+        del buf[:pos]
+        offset += pos
+        pos = 0
+        search_from = max(1, len(buf) - 256)
+        chunk = fp.read(chunk_size)
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        eof = not chunk
+        buf += chunk
+
+
+def candidate_spans(run: bytes) -> list[tuple[int, int]]:
+    """``(start, end)`` of the pieces of ``run`` between candidate boundaries of any key.
+
+    Finer than the runs of :func:`iter_elements`: every element starts a
+    piece, and so does every nested object that follows ``}, ``.
+    """
+    spans, start = [], 0
+    for match in _ANY_CUT.finditer(run):
+        spans.append((start, match.start() + 1))
+        start = match.start(1)
+    spans.append((start, len(run)))
+    return spans
+
+
+def decode_elements(text: str) -> Iterator[tuple[object, int]]:
+    """Decode an ``element, element, ...`` run of :func:`iter_elements`.
+
+    Yields every complete element with the position in ``text`` where the
+    next one starts. Stops without an error when the text ends inside an
+    element, so ``text[position:]`` is the cut-off rest (blank when the run
+    ended on a boundary). Raises ``ValueError`` for malformed JSON.
+    """
+    pos = _SKIP_WHITESPACE.match(text).end()
+    while pos < len(text):
+        try:
+            value, end = _DECODER.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            if not _is_truncation(e):
+                raise ValueError(f'Malformed export: {e.msg}') from None
+            return
+        pos = _SKIP_WHITESPACE.match(text, end).end()
+        if pos < len(text):
+            if text[pos] != ',':
+                raise ValueError('Malformed export: expected "," between conversations')
+            pos = _SKIP_WHITESPACE.match(text, pos + 1).end()
+        yield value, pos
+
+
+def _normalize_slice(data: bytes, columns, all_branches: bool = False) -> tuple[MessageColumns, int, bytes]:
+    """Worker entry point: decode and normalize ``conversation, conversation, ...`` bytes.
+
+    Returns ``columns`` (an empty sink from the parent) holding the slice,
+    the number of conversations and the bytes of a trailing conversation that
+    was cut off (empty when the slice ended on a boundary).
+    """
+    text = data.decode('utf-8')
+    n_convos = rest = 0
+    for convo, rest in decode_elements(text):
+        normalize_conversation(convo, columns, all_branches)
+        n_convos += 1
+    leftover = text[rest:]
+    return columns, n_convos, leftover.encode('utf-8') if leftover.strip() else b''
+
+
+def make_executor(workers: int | None = None) -> ProcessPoolExecutor:
+    """Create a process pool suitable for :func:`parse_export_parallel`.
+
+    Prefers the ``fork`` start method: Streamlit registers the page script as
+    ``__main__``, and ``spawn``/``forkserver`` would re-run it in every worker.
+    Reuse the pool across uploads to pay the start-up cost once.
+    """
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context(method),
+    )
+
+
+def parse_export_parallel(
+    fp: IO,
+    sink: MessageColumns | None = None,
+    progress: Callable[[float, int], None] | None = None,
+    executor: Executor | None = None,
+    workers: int | None = None,
+    slice_bytes: int = SLICE_BYTES,
+    all_branches: bool = False,
+):
+    """Parallel counterpart of :func:`parse_export` for large exports.
+
+    Worker processes decode and normalize byte slices of the export into
+    columnar chunks, which are merged back in file order. At most two slices
+    per worker are in flight, so memory stays bounded by the slice size. The
+    legacy ``{"conversations": [...]}`` wrapper is parsed serially.
+
+    Workers fill the empty sinks made by ``sink.like()``, which must be
+    picklable and provide ``extend``.
+    """
+    if sink is None:
+        sink = MessageColumns()
+    here = fp.tell()
+    head = fp.read(64)
+    fp.seek(here)
+    if isinstance(head, str):
+        head = head.encode('utf-8')
+    if head.lstrip(codecs.BOM_UTF8).lstrip().startswith(b'{'):
+        return parse_export(fp, sink, progress, all_branches=all_branches)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = make_executor(workers)
+    max_in_flight = 2 * (workers or getattr(executor, '_max_workers', None) or os.cpu_count() or 1)
+
+    total_bytes = stream_size(fp)
+    pending: list = []  # [future, slice, bytes_read] in file order
+    n_convos = 0
+
+    def merge_oldest(final: bool = False) -> None:
+        nonlocal n_convos
+        future, _, bytes_read = pending[0]
+        columns, count, leftover = future.result()
+        if leftover and len(pending) == 1:
+            if final:
+                raise ValueError('Malformed export: truncated or invalid JSON')
+            return  # Wait for the next slice to complete the cut-off conversation
+        pending.pop(0)
+        sink.extend(columns)
+        n_convos += count
+        if leftover:
+            # The cut fell inside a conversation, so the next slice started
+            # mid-conversation: discard its result and re-run it with the tail.
+            stale, next_data, next_bytes_read = pending[0]
+            stale.cancel()
+            data = leftover + b',' + next_data
+            pending[0] = [executor.submit(_normalize_slice, data, sink.like(), all_branches), data, next_bytes_read]
+        if progress is not None:
+            fraction = min(bytes_read / total_bytes, 1.0) if total_bytes else 0.0
+            progress(fraction, n_convos)
+
+    try:
+        for offset, data in iter_elements(fp, slice_bytes):
+            bytes_read = offset + len(data)
+            pending.append([executor.submit(_normalize_slice, data, sink.like(), all_branches), data, bytes_read])
+            if len(pending) >= max_in_flight:
+                merge_oldest()
+        while pending:
+            merge_oldest(final=True)
+    finally:
+        for future, _, _ in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+    return sink, n_convos
@@ -0,0 +1,180 @@
+"""Load → normalize → derive → stats pipeline, independent of any UI.
+
+The Streamlit page and the batch CLI (:mod:`chatgpt_wrapped.cli`) both go
+through these functions, so a report written headlessly shows the same numbers
+as the page for the same export.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Executor
+from typing import IO, Callable
+
+import numpy as np
+import pandas as pd
+
+from chatgpt_wrapped.derive import DAY_NAMES, add_calendar_columns, day_name, month_name, with_dates
+from chatgpt_wrapped.parsing import MessageColumns, open_export, parse_export, parse_export_parallel, stream_size
+from chatgpt_wrapped.streaming import StreamingStats
+
+# Exports at least this large are normalized across a process pool when one is given
+PARALLEL_PARSE_BYTES = 64 << 20
+# The message table keeps assistant replies for their timestamps only
+MESSAGE_ROLES = frozenset({'user', 'assistant'})
+TEXT_ROLES = frozenset({'user'})
+
+
+def _parse(fp: IO, sink, progress, executor: Executor | None, parallel_bytes: int, all_branches: bool) -> tuple:
+    with open_export(fp) as stream:
+        size = stream_size(stream)
+        if executor is not None and size is not None and size >= parallel_bytes:
+            return parse_export_parallel(stream, sink, progress=progress, executor=executor, all_branches=all_branches)
+        return parse_export(stream, sink, progress=progress, all_branches=all_branches)
+
+
+def load_export(
+    fp: IO,
+    progress: Callable[[float, int], None] | None = None,
+    executor: Executor | None = None,
+    parallel_bytes: int = PARALLEL_PARSE_BYTES,
+    all_branches: bool = False,
+) -> dict:
+    """Parse an export (``conversations.json`` or the export zip) into the message table.
+
+    The table holds user messages and, without their text, assistant replies.
+    Returns ``{'df', 'conversation_ids', 'total_convos', 'messages_seen'}``;
+    raises ``ValueError`` if the file is not a ChatGPT export. Only the
+    branch of each conversation the user last saw is read unless
+    ``all_branches`` is set.
+    """
+    sink = MessageColumns(MESSAGE_ROLES, TEXT_ROLES)
+    columns, total_convos = _parse(fp, sink, progress, executor, parallel_bytes, all_branches)
+    return {
+        'df': columns.to_frame(),
+        'conversation_ids': columns.conversation_index(),
+        'total_convos': total_convos,
+        'messages_seen': columns.seen,
+    }
+
+
+def stream_export(
+    fp: IO,
+    progress: Callable[[float, int], None] | None = None,
+    executor: Executor | None = None,
+    parallel_bytes: int = PARALLEL_PARSE_BYTES,
+    all_branches: bool = False,
+) -> dict:
+    """Aggregate an export in one pass, without building the message table.
+
+    Returns ``{'stats', 'total_convos', 'messages_seen'}``, where ``stats`` is
+    what :func:`describe` returns: enough for the report, not for anything
+    that reads message text.
+    """
+    sink, total_convos = _parse(fp, StreamingStats(keep_roles={'user'}), progress, executor, parallel_bytes, all_branches)
+    return {'stats': sink.result(), 'total_convos': total_convos, 'messages_seen': sink.seen}
+
+
+def user_messages(df: pd.DataFrame) -> pd.DataFrame:
+    """The user rows of the message table with calendar columns."""
+    # Small-int calendar fields; day and month names are attached at display time
+    return add_calendar_columns(df[df['role'] == 'user'])
+
+
+def describe(df: pd.DataFrame) -> dict:
+    """The aggregates behind Quick Stats and the charts."""
+    return aggregate(user_messages(df))
+
+
+def aggregate(user_df: pd.DataFrame) -> dict:
+    """Per-day, per-conversation and calendar counts for user messages with calendar columns.
+
+    Everything below reads only these aggregates, so
+    :class:`~chatgpt_wrapped.streaming.StreamingStats` can produce them without
+    the table.
+    """
+    conv_lengths = user_df.groupby('conversation').size()
+    return {
+        'daily_counts': user_df.groupby('day').size(),
+        # Numbered among conversations with user messages; codes of
+        # assistant-only conversations would leave gaps
+        'conv_lengths': conv_lengths.set_axis(pd.RangeIndex(len(conv_lengths), name='conversation').astype(np.int32)),
+        'total_words': int(user_df['word_count'].sum()),
+        'word_count_n': int(user_df['word_count'].count()),
+        'hour_counts': user_df['hour'].value_counts(),
+        'weekday_counts': user_df['weekday'].value_counts(),
+        'month_counts': user_df['month'].value_counts(),
+    }
+
+
+def quick_stats(stats: dict, total_convos: int) -> dict:
+    """The "Quick Stats" metrics as plain numbers."""
+    daily_counts = stats['daily_counts']
+    word_count_n = stats['word_count_n']
+    return {
+        'total_requests': int(daily_counts.sum()),
+        'total_conversations': total_convos,
+        'avg_requests_per_day': float(daily_counts.mean()),
+        'avg_words_per_request': stats['total_words'] / word_count_n if word_count_n else float('nan'),
+        'total_words': stats['total_words'],
+        'max_requests_in_a_day': int(daily_counts.max()),
+        'avg_conversation_length': float(stats['conv_lengths'].mean()),
+    }
+
+
+def usage_patterns(stats: dict) -> dict:
+    """Most active day of the week, peak hour (0-23) and busiest month."""
+    return {
+        'most_active_day': day_name(stats['weekday_counts'].index[0]),
+        'peak_hour': int(stats['hour_counts'].index[0]),
+        'busiest_month': month_name(stats['month_counts'].index[0]),
+    }
+
+
+def histograms(stats: dict) -> dict[str, pd.Series]:
+    """Requests per calendar date, per day of the week and per hour of the day.
+
+    The day-of-week and hour histograms cover every bucket, zeros included.
+    """
+    weekday = stats['weekday_counts'].reindex(range(7), fill_value=0).to_numpy()
+    hour = stats['hour_counts'].reindex(range(24), fill_value=0).to_numpy()
+    return {
+        'daily': with_dates(stats['daily_counts']),
+        'day_of_week': pd.Series(weekday, index=pd.Index(DAY_NAMES, name='day_of_week')),
+        'hour': pd.Series(hour, index=pd.RangeIndex(24, name='hour')),
+    }
+
+
+def build_report(loaded: dict, stats: dict) -> dict:
+    """JSON-serializable report: Quick Stats, Usage Patterns and histograms."""
+    return {
+        'quick_stats': quick_stats(stats, loaded['total_convos']),
+        'usage_patterns': usage_patterns(stats),
+        'histograms': {
+            name: {str(k): int(v) for k, v in counts.items()}
+            for name, counts in histograms(stats).items()
+        },
+    }
+
+
+def analyze(
+    fp: IO,
+    executor: Executor | None = None,
+    parallel_bytes: int = PARALLEL_PARSE_BYTES,
+    streaming: bool = True,
+    all_branches: bool = False,
+) -> dict | None:
+    """Run the whole pipeline on one export; ``None`` if it holds no user messages.
+
+    ``streaming=False`` builds the message table first, like the page does;
+    the report is the same either way. ``all_branches`` also counts edited
+    prompts and regenerated answers.
+    """
+    if streaming:
+        loaded = stream_export(fp, executor=executor, parallel_bytes=parallel_bytes, all_branches=all_branches)
+        stats = loaded['stats']
+    else:
+        loaded = load_export(fp, executor=executor, parallel_bytes=parallel_bytes, all_branches=all_branches)
+        stats = describe(loaded['df'])
+    if stats['daily_counts'].empty:
+        return None
+    return build_report(loaded, stats)
@@ -0,0 +1,119 @@
+"""Build the chat-history prompt sent to Gemini from the user message table.
+
+Messages are truncated to a fixed number of words, grouped by conversation and,
+when the history exceeds the token budget, sampled evenly across calendar
+months so older usage is not crowded out by recent activity. The sample is
+stable: a re-upload that adds or edits a few conversations only changes the
+selection in the months they fall in. Every step works on whole columns; only
+messages that actually need truncating are split in Python.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pandas as pd
+
+WORDS_PER_MESSAGE = 100
+DEFAULT_TOKEN_BUDGET = 200_000
+CHARS_PER_TOKEN = 4  # rough average for English text
+# The sampling rate moves in steps of 2**(-1/RATE_STEPS), so a slightly
+# larger history usually keeps the same rate
+RATE_STEPS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_words(content: pd.Series, word_count: pd.Series, max_words: int) -> pd.Series:
+    """Cut messages longer than ``max_words`` words, joining the kept words with spaces.
+
+    Only the over-long rows are touched; the rest are passed through as-is.
+    """
+    text = content.astype(pd.StringDtype('pyarrow'))
+    long_rows = (word_count > max_words).fillna(False).to_numpy(dtype=bool)
+    if long_rows.any():
+        text = text.copy()
+        text[long_rows] = [' '.join(s.split()[:max_words]) for s in text[long_rows]]
+    return text
+
+
+def _priorities(timestamps: np.ndarray, seed: int) -> np.ndarray:
+    """Pseudo-random values in [0, 1) that depend only on each timestamp and ``seed`` (splitmix64)."""
+    z = timestamps.astype(np.int64).view(np.uint64) + np.uint64((seed + 1) * 0x9E3779B97F4A7C15 % (1 << 64))
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) / (1 << 53)
+
+
+def sample_by_month(timestamps: pd.Series, tokens: pd.Series, token_budget: int, seed: int = 0) -> np.ndarray:
+    """Return a boolean mask selecting messages that fit ``token_budget``.
+
+    Every calendar month keeps the same share of its tokens, the largest
+    power of ``2**(-1/RATE_STEPS)`` that fits the budget. Within a month,
+    messages are drawn in an order seeded by their timestamps, so months
+    whose messages did not change keep their sample when the history grows.
+    """
+    token_arr = tokens.to_numpy(dtype=np.int64)
+    total = token_arr.sum()
+    if total <= token_budget:
+        return np.ones(len(token_arr), dtype=bool)
+    if token_budget <= 0:
+        return np.zeros(len(token_arr), dtype=bool)
+
+    stamps = timestamps.to_numpy(dtype=np.int64)
+    month = stamps.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    month_codes, month_index = np.unique(month, return_inverse=True)
+    rate = 2.0 ** (-math.ceil(RATE_STEPS * math.log2(total / token_budget)) / RATE_STEPS)
+    quota = np.bincount(month_index, weights=token_arr, minlength=len(month_codes)) * rate
+
+    order = np.lexsort((_priorities(stamps, seed), month_index))
+    sorted_tokens = token_arr[order]
+    sorted_month = month_index[order]
+    # Running token total within each month in the shuffled order
+    cumulative = np.cumsum(sorted_tokens)
+    month_start = np.searchsorted(sorted_month, np.arange(len(month_codes)))
+    offset = np.concatenate(([0], cumulative))[month_start]
+    within = cumulative - offset[sorted_month]
+
+    keep = np.zeros(len(token_arr), dtype=bool)
+    keep[order] = within <= quota[sorted_month]
+    return keep
+
+
+def build_prompt(
+    messages: pd.DataFrame,
+    words_per_message: int = WORDS_PER_MESSAGE,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    seed: int = 0,
+) -> str:
+    """Join user messages into one prompt string.
+
+    One line per message, a blank line between conversations, messages in
+    table order. ``messages`` needs ``conversation``, ``content``,
+    ``word_count`` and ``timestamp`` columns. ``token_budget=None`` disables sampling.
+    """
+    keep = messages['content'].notna().to_numpy(dtype=bool, copy=True)
+    if token_budget is not None and keep.any():
+        # Estimate each line's size after truncation (plus separating newlines)
+        # so only the sampled messages are ever split.
+        length = messages['content'].str.len().to_numpy(dtype=np.float64, na_value=0)
+        word_count = messages['word_count'].to_numpy(dtype=np.float64, na_value=0)
+        kept_share = np.minimum(1.0, words_per_message / np.maximum(word_count, 1))
+        tokens = np.where(keep, (length * kept_share + 2) // CHARS_PER_TOKEN + 1, 0)
+        keep &= sample_by_month(messages['timestamp'], pd.Series(tokens), token_budget, seed)
+    if not keep.any():
+        return ''
+    # Take the (large) content column only once, for the kept rows
+    rows = np.flatnonzero(keep)
+    text = truncate_words(messages['content'].take(rows), messages['word_count'].take(rows), words_per_message)
+
+    conversation = messages['conversation'].to_numpy()[rows]
+    new_conversation = np.empty(len(conversation), dtype=bool)
+    new_conversation[0] = False
+    new_conversation[1:] = conversation[1:] != conversation[:-1]
+    prefix = pd.Series(np.where(new_conversation, '\n\n', ''), index=text.index, dtype=pd.StringDtype('pyarrow'))
+    return (prefix + text + '\n').str.cat()
@@ -0,0 +1,258 @@
+"""Full-text search over the message table with an in-memory inverted index.
+
+:class:`SearchIndex` is built once per upload. Tokenization, lowercasing and
+term numbering run in Arrow compute kernels. The postings are stored in CSR
+form: for every term of the sorted vocabulary, the rows and word positions
+where it occurs. A query is a few binary searches plus sorted-array
+intersections, so it takes milliseconds on a million messages and never
+rescans the text. The index is a few flat arrays, so it can be kept in the
+:class:`~chatgpt_wrapped.cache.ResultCache` next to the parsed table.
+
+Query syntax: words must all occur (``pandas merge``); ``"quoted words"``
+must occur next to each other in that order; ``pand*`` matches any word with
+that prefix.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from chatgpt_wrapped.derive import SECONDS_PER_DAY
+
+# Letters and digits; Python's [^\W_] matches the same characters as RE2's [\p{L}\p{N}]
+_SPLIT = r'[^\p{L}\p{N}]+'
+_WORD = re.compile(r'[^\W_]+')
+_CLAUSE = re.compile(r'"([^"]*)"|(\S+)')
+# Characters that Markdown would interpret in a snippet
+_MARKDOWN = re.compile(r'[\\`*_{}\[\]()<>#+\-.!|~$]')
+SNIPPET_CHARS = 160
+
+
+def _tokens(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def parse_query(query: str) -> list[tuple[str, list[str]]]:
+    """Split a query into ``('term' | 'prefix' | 'phrase', words)`` clauses."""
+    clauses = []
+    for phrase, word in _CLAUSE.findall(query):
+        if phrase:
+            words = _tokens(phrase)
+            if len(words) > 1:
+                clauses.append(('phrase', words))
+            elif words:
+                clauses.append(('term', words))
+        elif word.endswith('*') and _tokens(word):
+            clauses.append(('prefix', _tokens(word)[:1]))
+        else:
+            clauses.extend(('term', [w]) for w in _tokens(word))
+    return clauses
+
+
+class SearchIndex:
+    """Positional inverted index over the ``content`` column of a message table.
+
+    ``vocabulary`` is sorted; the postings of term ``i`` are
+    ``rows[offsets[i]:offsets[i + 1]]`` and the matching ``positions``,
+    ordered by row and then position.
+    """
+
+    def __init__(self, vocabulary: np.ndarray, offsets: np.ndarray, rows: np.ndarray, positions: np.ndarray, n_rows: int):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.rows = rows
+        self.positions = positions
+        self.n_rows = n_rows
+
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+
+    @classmethod
+    def build(cls, messages: pd.DataFrame) -> SearchIndex:
+        content = pa.Array.from_pandas(messages['content'])
+        if isinstance(content, pa.ChunkedArray):
+            content = content.combine_chunks()
+        words = pc.split_pattern_regex(pc.utf8_lower(content), _SPLIT)
+        tokens = pc.list_flatten(words)
+        rows = pc.list_parent_indices(words).to_numpy().astype(np.int32)
+        # Word position within its message; only leading and trailing separators
+        # yield empty tokens, so adjacency is preserved when they are dropped
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(rows)) + 1))
+        run_start = np.repeat(starts, np.diff(np.append(starts, len(rows)))) if len(rows) else starts
+        positions = (np.arange(len(rows)) - run_start).astype(np.int32)
+        keep = pc.not_equal(tokens, '').to_numpy(zero_copy_only=False)
+        tokens = tokens.filter(pa.array(keep))
+        rows, positions = rows[keep], positions[keep]
+
+        encoded = tokens.dictionary_encode()
+        vocabulary = encoded.dictionary.to_numpy(zero_copy_only=False).astype(object)
+        # Number terms in sorted order so prefixes are contiguous ranges
+        by_term = np.argsort(vocabulary, kind='stable')
+        rank = np.empty(len(vocabulary), dtype=np.int32)
+        rank[by_term] = np.arange(len(vocabulary), dtype=np.int32)
+        term = rank[encoded.indices.to_numpy()]
+        order = np.argsort(term, kind='stable')
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term, minlength=len(vocabulary)), out=offsets[1:])
+        return cls(vocabulary[by_term], offsets, rows[order], positions[order], len(messages))
+
+    # ────────────────────────  Cache entry  ─────────────────────────
+    def to_entry(self) -> dict:
+        """Frames for :meth:`ResultCache.put <chatgpt_wrapped.cache.ResultCache.put>`."""
+        return {
+            'vocabulary': pd.DataFrame({'term': pd.array(self.vocabulary, dtype=pd.StringDtype('pyarrow')),
+                                        'offset': self.offsets[:-1]}),
+            'postings': pd.DataFrame({'row': self.rows, 'position': self.positions}),
+            'n_rows': self.n_rows,
+        }
+
+    @classmethod
+    def from_entry(cls, entry: dict) -> SearchIndex:
+        vocabulary, postings = entry['vocabulary'], entry['postings']
+        offsets = np.append(vocabulary['offset'].to_numpy(dtype=np.int64), len(postings))
+        return cls(
+            vocabulary['term'].to_numpy(dtype=object),
+            offsets,
+            postings['row'].to_numpy(dtype=np.int32),
+            postings['position'].to_numpy(dtype=np.int32),
+            int(entry['n_rows']),
+        )
+
+    # ────────────────────────  Queries  ─────────────────────────────
+    def _term_range(self, word: str, prefix: bool = False) -> tuple[int, int]:
+        lo = int(np.searchsorted(self.vocabulary, word, side='left'))
+        if prefix:
+            hi = int(np.searchsorted(self.vocabulary, word + '\U0010ffff', side='left'))
+        else:
+            hi = lo + 1 if lo < len(self.vocabulary) and self.vocabulary[lo] == word else lo
+        return lo, hi
+
+    def _postings(self, word: str) -> slice:
+        lo, hi = self._term_range(word)
+        return slice(self.offsets[lo], self.offsets[hi])
+
+    def _distinct_rows(self, rows: np.ndarray) -> np.ndarray:
+        # A row mask is cheaper than np.unique and also merges the
+        # interleaved postings of several terms
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return np.flatnonzero(mask).astype(np.int32)
+
+    def _term_rows(self, word: str, prefix: bool = False) -> np.ndarray:
+        lo, hi = self._term_range(word, prefix)
+        return self._distinct_rows(self.rows[self.offsets[lo]:self.offsets[hi]])
+
+    def _phrase_rows(self, words: list[str]) -> np.ndarray:
+        spans = [self._postings(word) for word in words]
+        matches = None
+        # Rarest word first keeps every intersection small
+        for shift in sorted(range(len(words)), key=lambda i: spans[i].stop - spans[i].start):
+            # (row, position of the phrase's first word) as one sortable key
+            keys = (self.rows[spans[shift]].astype(np.int64) << 32) + self.positions[spans[shift]] - shift
+            matches = keys if matches is None else _intersect_sorted(matches, keys)
+            if not len(matches):
+                break
+        return self._distinct_rows(matches >> 32)
+
+    def search(
+        self,
+        messages: pd.DataFrame,
+        query: str,
+        start: dt.date | None = None,
+        end: dt.date | None = None,
+        roles: list[str] | None = None,
+    ) -> dict:
+        """Messages matching ``query``, optionally within dates and roles.
+
+        ``start`` and ``end`` are inclusive UTC dates. Returns ``rows`` (sorted
+        row positions in ``messages``), ``count``, ``daily_counts`` (hits per
+        day, keyed like the stats' ``daily_counts``) and ``words`` (the query
+        words, for highlighting).
+        """
+        clauses = parse_query(query)
+        hits = []
+        for kind, words in clauses:
+            if kind == 'term':
+                hits.append(self._term_rows(words[0]))
+            elif kind == 'prefix':
+                hits.append(self._term_rows(words[0], prefix=True))
+            else:
+                hits.append(self._phrase_rows(words))
+        hits.sort(key=len)
+        rows = hits[0] if hits else np.zeros(0, dtype=np.int32)
+        for other in hits[1:]:
+            rows = _intersect_sorted(rows, other)
+
+        timestamp = messages['timestamp'].to_numpy(dtype=np.int64)[rows]
+        keep = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            keep &= timestamp >= (start - dt.date(1970, 1, 1)).days * SECONDS_PER_DAY
+        if end is not None:
+            keep &= timestamp < ((end - dt.date(1970, 1, 1)).days + 1) * SECONDS_PER_DAY
+        if roles is not None:
+            role = messages['role'].cat
+            keep &= np.isin(role.codes.to_numpy()[rows], np.flatnonzero(role.categories.isin(roles)))
+        rows, timestamp = rows[keep], timestamp[keep]
+
+        days, counts = np.unique(timestamp // SECONDS_PER_DAY, return_counts=True)
+        return {
+            'rows': rows,
+            'count': len(rows),
+            'daily_counts': pd.Series(counts, index=pd.Index(days.astype(np.int32), name='day')),
+            'words': [(kind, word) for kind, words in clauses for word in words],
+        }
+
+
+def _intersect_sorted(small: np.ndarray, large: np.ndarray) -> np.ndarray:
+    """Values of sorted, duplicate-free ``small`` that occur in sorted ``large``.
+
+    O(len(small) * log(len(large))), which beats a merge when one side is rare.
+    """
+    if len(small) > len(large):
+        small, large = large, small
+    found = np.searchsorted(large, small)
+    found[found == len(large)] = 0
+    return small[large[found] == small] if len(large) else large[:0]
+
+
+def snippets(messages: pd.DataFrame, result: dict, limit: int = 20, width: int = SNIPPET_CHARS) -> pd.DataFrame:
+    """The ``limit`` most recent hits of a :meth:`SearchIndex.search` result with a text excerpt.
+
+    Snippets are Markdown: matched words are bold, everything else is escaped. Columns: ``timestamp``,
+    ``conversation`` and ``snippet``.
+    """
+    rows = result['rows']
+    timestamp = messages['timestamp'].to_numpy(dtype=np.int64)[rows]
+    if len(rows) > limit:
+        top = np.argpartition(-timestamp, limit)[:limit]
+        recent = rows[top[np.argsort(-timestamp[top], kind='stable')]]
+    else:
+        recent = rows[np.argsort(-timestamp, kind='stable')]
+    patterns = [re.escape(word) + (r'[^\W_]*' if kind == 'prefix' else r'(?![^\W_])') for kind, word in result['words']]
+    highlight = re.compile(r'(?<![^\W_])(?:' + '|'.join(patterns) + ')', re.IGNORECASE) if patterns else None
+    excerpts = []
+    content = messages['content']
+    for row in recent:
+        # Positional lookups; a take would copy the whole Arrow column when it has several chunks
+        text = content.iat[row]
+        text = text if isinstance(text, str) else ''
+        match = highlight.search(text) if highlight else None
+        begin = max(0, match.start() - width // 3) if match else 0
+        excerpt = ' '.join(text[begin:begin + width].split())
+        pieces, last = [], 0
+        for hit in highlight.finditer(excerpt) if highlight else ():
+            pieces += [_MARKDOWN.sub(r'\\\g<0>', excerpt[last:hit.start()]), f'**{hit.group(0)}**']
+            last = hit.end()
+        pieces.append(_MARKDOWN.sub(r'\\\g<0>', excerpt[last:]))
+        excerpts.append(('…' if begin else '') + ''.join(pieces) + ('…' if begin + width < len(text) else ''))
+    return pd.DataFrame({
+        'timestamp': messages['timestamp'].to_numpy(dtype=np.int64)[recent],
+        'conversation': messages['conversation'].to_numpy()[recent],
+        'snippet': excerpts,
+    })
@@ -0,0 +1,109 @@
+"""One-pass statistics that never build the message table.
+
+:class:`StreamingStats` is a parser sink like
+:class:`~chatgpt_wrapped.parsing.MessageColumns`, but instead of storing
+messages it updates counters by hour (since the epoch) and conversation plus
+word-count sums; day, hour-of-day, weekday and month counts are folded from
+the hourly ones at the end. Memory is O(days + conversations), at most 24
+counters per day, whatever the number of messages.
+:meth:`StreamingStats.result` returns the same aggregates as
+:func:`chatgpt_wrapped.pipeline.aggregate`. Values, dtypes and the tie order
+of the ``value_counts`` Series all match, so Quick Stats, Usage Patterns and
+the histograms are identical on either path.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from chatgpt_wrapped.derive import _EPOCH_WEEKDAY
+
+
+def _value_counts(keys: np.ndarray, counts: np.ndarray, name: str, dtype) -> pd.Series:
+    """``Series.value_counts`` layout: descending counts, ties in first-appearance order.
+
+    ``keys`` must already be in first-appearance order.
+    """
+    order = np.argsort(-counts, kind='stable')
+    return pd.Series(counts[order], index=pd.Index(keys[order].astype(dtype), name=name), name='count')
+
+
+def _first_seen_totals(groups: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sum ``counts`` per group, keeping groups in order of first appearance."""
+    uniques, first, inverse = np.unique(groups, return_index=True, return_inverse=True)
+    totals = np.bincount(inverse, weights=counts, minlength=len(uniques)).astype(np.int64)
+    order = np.argsort(first, kind='stable')
+    return uniques[order], totals[order]
+
+
+class StreamingStats:
+    """Parser sink that keeps only online aggregates of the messages.
+
+    ``keep_roles`` and ``seen`` behave as in ``MessageColumns``; the app
+    aggregates user messages only. Dicts preserve insertion order, which is
+    the first-appearance order pandas uses to break ties in ``value_counts``.
+    """
+
+    def __init__(self, keep_roles: Iterable[str] | None = None):
+        self.keep_roles = frozenset(keep_roles) if keep_roles is not None else None
+        self.hourly: dict[int, int] = {}  # hours since the epoch
+        self.conversations: dict = {}
+        self.total_words = 0
+        self.word_count_n = 0
+        self.seen = 0
+
+    def __len__(self) -> int:
+        return sum(self.hourly.values())
+
+    def like(self) -> StreamingStats:
+        """An empty sink with the same settings, e.g. for a worker to fill."""
+        return StreamingStats(self.keep_roles)
+
+    def append(self, conversation_id, role, content, timestamp: float) -> None:
+        self.seen += 1
+        if self.keep_roles is not None and role not in self.keep_roles:
+            return
+        hour = math.floor(timestamp) // 3600
+        self.hourly[hour] = self.hourly.get(hour, 0) + 1
+        self.conversations[conversation_id] = self.conversations.get(conversation_id, 0) + 1
+        if isinstance(content, str):
+            self.total_words += len(content.split())
+            self.word_count_n += 1
+
+    def extend(self, other: StreamingStats) -> None:
+        """Merge aggregates of a later part of the stream (e.g. from a worker)."""
+        self.seen += other.seen
+        for target, source in ((self.hourly, other.hourly), (self.conversations, other.conversations)):
+            for key, count in source.items():
+                target[key] = target.get(key, 0) + count
+        self.total_words += other.total_words
+        self.word_count_n += other.word_count_n
+
+    def result(self) -> dict:
+        """Aggregates in the layout of :func:`chatgpt_wrapped.pipeline.aggregate`."""
+        epoch_hours = np.fromiter(self.hourly.keys(), dtype=np.int64, count=len(self.hourly))
+        totals = np.fromiter(self.hourly.values(), dtype=np.int64, count=len(self.hourly))
+        lengths = np.fromiter(self.conversations.values(), dtype=np.int64, count=len(self.conversations))
+
+        # A day, hour of day, weekday or month first appears with the first
+        # epoch hour that falls in it
+        hours, hour_totals = _first_seen_totals(epoch_hours % 24, totals)
+        days, day_totals = _first_seen_totals(epoch_hours // 24, totals)
+        weekdays, weekday_totals = _first_seen_totals((days + _EPOCH_WEEKDAY) % 7, day_totals)
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+        months, month_totals = _first_seen_totals(months, day_totals)
+
+        by_day = np.argsort(days, kind='stable')
+        return {
+            'daily_counts': pd.Series(day_totals[by_day], index=pd.Index(days[by_day].astype(np.int32), name='day')),
+            'conv_lengths': pd.Series(lengths, index=pd.RangeIndex(len(lengths), name='conversation').astype(np.int32)),
+            'total_words': self.total_words,
+            'word_count_n': self.word_count_n,
+            'hour_counts': _value_counts(hours, hour_totals, 'hour', np.int8),
+            'weekday_counts': _value_counts(weekdays, weekday_totals, 'weekday', np.int8),
+            'month_counts': _value_counts(months, month_totals, 'month', np.int8),
+        }
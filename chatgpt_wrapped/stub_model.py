@@ -0,0 +1,142 @@
+"""Local stand-in for the insights model, for running the app without network access.
+
+Speaks the protocol of :func:`chatgpt_wrapped.insights.http_generate` and
+answers with deterministic JSON built from word counts in the prompt. POSTs to
+``/image`` get a small PNG instead, standing in for the portrait model.
+Latency and a failure rate can be injected to exercise concurrency, retries
+and the background job queue; prompts containing ``fail_marker`` always fail,
+for tests that need particular calls to run out of retries::
+
+    python -m chatgpt_wrapped.stub_model --port 8765 --delay 0.5 --fail-rate 0.2
+    INSIGHTS_MODEL_URL=http://127.0.0.1:8765 IMAGE_MODEL_URL=http://127.0.0.1:8765/image streamlit run streamlit_app.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_MIN_TOPIC_LENGTH = 4
+_IMAGE_SIZE = 64
+
+
+def stub_answer(prompt: str) -> dict:
+    """Summary and topics derived only from ``prompt``; merges partial-result lists too."""
+    try:
+        partials = json.loads(prompt)
+    except ValueError:
+        partials = None
+    if isinstance(partials, list):
+        words = [t for p in partials for t in p.get('topics', [])]
+    else:
+        words = [w for w in prompt.lower().split() if w.isalpha() and len(w) >= _MIN_TOPIC_LENGTH]
+    topics = [word for word, _ in Counter(words).most_common(10)]
+    summary = f"This part of the history has {len(prompt.split())} words. Its leading topics are {', '.join(topics[:3]) or 'unclear'}."
+    return {'summary': summary, 'topics': topics}
+
+
+def stub_image(prompt: str) -> bytes:
+    """A small PNG whose colour is derived from ``prompt``."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (_IMAGE_SIZE, _IMAGE_SIZE), tuple(hashlib.sha256(prompt.encode()).digest()[:3])).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class StubModelServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering every POST with :func:`stub_answer`."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=('127.0.0.1', 0),
+        delay: float = 0.0,
+        fail_rate: float = 0.0,
+        seed: int = 0,
+        fail_marker: str | None = None,
+    ):
+        super().__init__(address, _Handler)
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.fail_marker = fail_marker
+        self.requests_served = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> StubModelServer:
+        """Serve in a background thread; stop with ``shutdown()``."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubModelServer
+
+    def do_POST(self):
+        server = self.server
+        with server._lock:
+            server._in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server._in_flight)
+            fail = server._random.random() < server.fail_rate
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            time.sleep(server.delay)
+            if server.fail_marker and server.fail_marker in body.get('prompt', ''):
+                fail = True
+            if fail:
+                self._send(503, {'error': 'injected failure'})
+                return
+            if self.path.rstrip('/').endswith('/image'):
+                self._send_bytes(200, stub_image(body.get('prompt', '')), 'image/png')
+            else:
+                self._send(200, {'text': json.dumps(stub_answer(body.get('prompt', '')))})
+            with server._lock:
+                server.requests_served += 1
+        finally:
+            with server._lock:
+                server._in_flight -= 1
+
+    def _send(self, status: int, payload: dict) -> None:
+        self._send_bytes(status, json.dumps(payload).encode(), 'application/json')
+
+    def _send_bytes(self, status: int, data: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before each answer')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 503')
+    args = parser.parse_args()
+    server = StubModelServer((args.host, args.port), delay=args.delay, fail_rate=args.fail_rate)
+    print(f'Stub model listening on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""Synthetic ChatGPT exports for benchmarks and load testing.
+
+Generated files mimic the shapes found in real exports:
+
+* ``mapping`` trees with a hidden root, a system message whose
+  ``create_time`` is null, and branches from edited prompts and regenerated
+  answers (``current_node`` points at one leaf);
+* conversations in the legacy ``messages`` list format (``content`` or
+  ``text`` strings, ``timestamp`` instead of ``create_time``);
+* multi-part content: several text parts, ``multimodal_text`` with image
+  pointers, and tool output carried in ``content.text``;
+* non-ASCII text, so the decoder sees multi-byte characters.
+
+Text is cut from one shared, seeded corpus so even million-message exports
+are generated quickly and reproducibly::
+
+    python -m chatgpt_wrapped.synthetic 100000 exports/100k.json --seed 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import uuid
+from typing import IO, Iterator
+
+import numpy as np
+
+DEFAULT_DAYS = 730
+DEFAULT_START = 1_672_531_200  # 2023-01-01 UTC
+
+_VOCABULARY = (
+    'python pandas dataframe error function class import install version server database query index '
+    'react component state hook render css layout docker container deploy kubernetes cloud bucket '
+    'recipe dinner chicken pasta vegetarian oven minutes sauce garlic travel flight hotel itinerary '
+    'budget museum train email draft meeting manager feedback resume interview salary promotion '
+    'essay paragraph summary translate spanish german grammar poem story character chapter plot '
+    'workout running marathon protein sleep stretch knee doctor symptom vitamin therapy garden '
+    'tomato soil water plant invoice tax spreadsheet formula excel chart mortgage loan interest '
+    'explain why how what could would should please thanks example list steps compare better '
+    'the a to of and in is for it that with on this you can my be are as not or have'
+).split() + ['café', 'naïve', 'résumé', 'über', '日本語', 'привет', '🙂', '🚀']
+
+# Relative activity per hour of day (UTC), quiet at night with an evening peak
+_HOUR_WEIGHTS = np.array([
+    1, 1, 1, 1, 1, 1, 2, 4, 6, 7, 7, 7, 6, 6, 7, 7, 7, 6, 6, 7, 8, 8, 6, 3,
+], dtype=np.float64)
+
+
+class _Corpus:
+    """Random text drawn from a Zipf-weighted vocabulary, sliced into messages."""
+
+    def __init__(self, rng: np.random.Generator, n_words: int = 1 << 20):
+        ranks = np.arange(1, len(_VOCABULARY) + 1, dtype=np.float64)
+        # Shuffle so frequent words are not always the first in the vocabulary
+        weights = rng.permutation(1.0 / ranks)
+        words = np.array(_VOCABULARY, dtype=object)[rng.choice(len(_VOCABULARY), n_words, p=weights / weights.sum())]
+        self.text = ' '.join(words)
+        lengths = np.fromiter((len(w) + 1 for w in words), dtype=np.int64, count=n_words)
+        self.starts = np.concatenate(([0], np.cumsum(lengths)))
+        self.n_words = n_words
+        self.rng = rng
+
+    def words(self, count: int) -> str:
+        count = max(1, min(count, self.n_words - 1))
+        first = int(self.rng.integers(0, self.n_words - count))
+        return self.text[self.starts[first]:self.starts[first + count] - 1]
+
+
+def _uuid(rng: np.random.Generator) -> str:
+    return str(uuid.UUID(bytes=rng.bytes(16), version=4))
+
+
+def _message(rng, corpus, role: str, ts: float | None, words: int) -> dict:
+    roll = rng.random()
+    if role == 'tool':
+        content = {'content_type': 'execution_output', 'text': corpus.words(words)}
+    elif role == 'user' and roll < 0.05:
+        content = {
+            'content_type': 'multimodal_text',
+            'parts': [
+                {'content_type': 'image_asset_pointer', 'asset_pointer': f'file-service://file-{_uuid(rng)}',
+                 'width': 1024, 'height': 768, 'size_bytes': int(rng.integers(10_000, 900_000))},
+                corpus.words(words),
+            ],
+        }
+    elif roll < 0.08:
+        # Long answers are sometimes split into several text parts
+        content = {'content_type': 'text', 'parts': [corpus.words(words), corpus.words(max(1, words // 2))]}
+    else:
+        content = {'content_type': 'text', 'parts': [corpus.words(words)]}
+    return {
+        'id': _uuid(rng),
+        'author': {'role': role, 'name': None, 'metadata': {}},
+        'create_time': ts,
+        'update_time': None,
+        'content': content,
+        'status': 'finished_successfully',
+        'end_turn': role == 'assistant' or None,
+        'weight': 1.0,
+        'metadata': {'model_slug': 'gpt-4o'} if role == 'assistant' else {},
+        'recipient': 'all',
+    }
+
+
+def _word_count(rng, role: str) -> int:
+    # Log-normal lengths: short prompts, long answers
+    median = 18 if role == 'user' else 140
+    return int(rng.lognormal(np.log(median), 0.8)) + 1
+
+
+def _mapping_conversation(rng, corpus, start: float, n_messages: int, branch_rate: float) -> tuple[dict, int]:
+    """A conversation tree with about ``n_messages`` messages; returns it and the message count."""
+    mapping: dict[str, dict] = {}
+
+    def add(message: dict | None, parent: str | None) -> str:
+        node_id = message['id'] if message else _uuid(rng)
+        mapping[node_id] = {'id': node_id, 'message': message, 'parent': parent, 'children': []}
+        if parent is not None:
+            mapping[parent]['children'].append(node_id)
+        return node_id
+
+    root = add(None, None)
+    system = _message(rng, corpus, 'system', None, 1)
+    system['content']['parts'] = ['']
+    system['metadata'] = {'is_visually_hidden_from_conversation': True}
+    leaf = add(system, root)
+
+    ts = start
+    count = 1
+    while count < n_messages:
+        ts += float(rng.exponential(90.0))
+        user = add(_message(rng, corpus, 'user', ts, _word_count(rng, 'user')), leaf)
+        count += 1
+        if rng.random() < branch_rate:
+            # An edited prompt: a sibling user message with its own answer
+            edited = add(_message(rng, corpus, 'user', ts + 30, _word_count(rng, 'user')), leaf)
+            ts += 60
+            add(_message(rng, corpus, 'assistant', ts, _word_count(rng, 'assistant')), edited)
+            count += 2
+            user = edited
+        parent = user
+        if rng.random() < 0.05:
+            ts += float(rng.exponential(5.0))
+            parent = add(_message(rng, corpus, 'tool', ts, 30), parent)
+            count += 1
+        ts += float(rng.exponential(20.0))
+        leaf = add(_message(rng, corpus, 'assistant', ts, _word_count(rng, 'assistant')), parent)
+        count += 1
+        if rng.random() < branch_rate:
+            # A regenerated answer that was not kept
+            add(_message(rng, corpus, 'assistant', ts + 15, _word_count(rng, 'assistant')), parent)
+            count += 1
+
+    convo_id = _uuid(rng)
+    convo = {
+        'title': corpus.words(int(rng.integers(2, 6))).title(),
+        'create_time': start,
+        'update_time': ts,
+        'mapping': mapping,
+        'moderation_results': [],
+        'current_node': leaf,
+        'plugin_ids': None,
+        'conversation_id': convo_id,
+        'conversation_template_id': None,
+        'gizmo_id': None,
+        'is_archived': False,
+        'safe_urls': [],
+        'default_model_slug': 'gpt-4o',
+        'id': convo_id,
+    }
+    return convo, count
+
+
+def _legacy_conversation(rng, corpus, start: float, n_messages: int) -> tuple[dict, int]:
+    messages = []
+    ts = start
+    for i in range(n_messages):
+        role = 'user' if i % 2 == 0 else 'assistant'
+        ts += float(rng.exponential(60.0))
+        text = corpus.words(_word_count(rng, role))
+        if rng.random() < 0.5:
+            messages.append({'role': role, 'content': text, 'timestamp': ts})
+        else:
+            messages.append({'author': {'role': role}, 'text': text, 'create_time': ts})
+    return {'id': _uuid(rng), 'title': 'Imported chat', 'messages': messages}, n_messages
+
+
+def iter_conversations(
+    n_messages: int,
+    seed: int = 0,
+    days: int = DEFAULT_DAYS,
+    start: int = DEFAULT_START,
+    legacy_rate: float = 0.02,
+    branch_rate: float = 0.05,
+) -> Iterator[dict]:
+    """Yield conversations, oldest first, until about ``n_messages`` messages exist."""
+    rng = np.random.default_rng(seed)
+    corpus = _Corpus(rng)
+    hour_p = _HOUR_WEIGHTS / _HOUR_WEIGHTS.sum()
+    produced = 0
+    # Conversation start times, sorted so the export reads like a real history
+    n_convos = max(1, n_messages // 9)
+    day = np.sort(rng.integers(0, days, n_convos))
+    hour = rng.choice(24, n_convos, p=hour_p)
+    starts = start + day * 86_400 + hour * 3_600 + rng.integers(0, 3_600, n_convos) + rng.random(n_convos)
+    i = 0
+    while produced < n_messages:
+        convo_start = float(starts[i % n_convos]) + (i // n_convos) * 60.0
+        size = min(n_messages - produced, max(2, int(rng.geometric(1 / 9))))
+        if rng.random() < legacy_rate:
+            convo, count = _legacy_conversation(rng, corpus, convo_start, size)
+        else:
+            convo, count = _mapping_conversation(rng, corpus, convo_start, size, branch_rate)
+        produced += count
+        i += 1
+        yield convo
+
+
+def write_export(fp: IO[str], n_messages: int, wrapped: bool = False, **options) -> int:
+    """Write an export with about ``n_messages`` messages to a text file; return the conversation count.
+
+    ``wrapped=True`` writes the legacy ``{"conversations": [...]}`` object
+    instead of a top-level array. Other options go to :func:`iter_conversations`.
+    """
+    fp.write('{"conversations": [' if wrapped else '[')
+    n = 0
+    for n, convo in enumerate(iter_conversations(n_messages, **options), 1):
+        if n > 1:
+            fp.write(', ')
+        fp.write(json.dumps(convo, ensure_ascii=False))
+    fp.write(']}' if wrapped else ']')
+    return n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Write a synthetic ChatGPT conversations.json.')
+    parser.add_argument('messages', type=int, help='approximate number of messages')
+    parser.add_argument('path', help='output file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help='length of the history in days')
+    parser.add_argument('--legacy-rate', type=float, default=0.02, help='share of conversations in the old messages format')
+    parser.add_argument('--branch-rate', type=float, default=0.05, help='chance of an edit or regeneration per turn')
+    parser.add_argument('--wrapped', action='store_true', help='write {"conversations": [...]} instead of an array')
+    args = parser.parse_args()
+    os.makedirs(os.path.dirname(os.path.abspath(args.path)), exist_ok=True)
+    with open(args.path, 'w', encoding='utf-8') as fp:
+        n = write_export(
+            fp, args.messages, wrapped=args.wrapped, seed=args.seed, days=args.days,
+            legacy_rate=args.legacy_rate, branch_rate=args.branch_rate,
+        )
+    print(f'Wrote {n} conversations to {args.path}')
+
+
+if __name__ == '__main__':
+    main()
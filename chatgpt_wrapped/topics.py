@@ -0,0 +1,186 @@
+"""Memory-bounded topic extraction, the offline fallback for AI insights.
+
+Messages are tokenized in batches and scored with TF-IDF, each conversation
+being one document. Nothing grows with the size of the history:
+
+* term weights go into a weighted Misra–Gries heavy-hitters sketch holding at
+  most ``2 * capacity`` terms;
+* document frequencies go into a fixed-size Count-Min sketch;
+* only the current conversation's term counts and one batch of messages are
+  held in full.
+
+A term's score is ``idf * Σ tf`` over conversations, so the IDF can be applied
+at the end, from the sketch, to the surviving candidates only. Time is linear
+in the amount of text.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TOP_K = 10
+DEFAULT_CAPACITY = 4096  # terms tracked by the heavy-hitters sketch
+SKETCH_WIDTH = 1 << 16
+SKETCH_DEPTH = 4
+BATCH_ROWS = 4096
+# A longer conversation is split into several documents
+MAX_DOCUMENT_TERMS = 1 << 16
+
+# Letters only, four or more of them: drops numbers, punctuation and most filler
+_TOKEN = re.compile(r'[^\W\d_]{4,}')
+
+STOP_WORDS = frozenset((
+    'the a an and or but in on at to for of with by is are was were be been have has had do does did '
+    'will would could should may might can this that these those i you he she it we they me him her us '
+    'them my your his its our their mine yours hers ours theirs '
+    'about above after again against also always another anyone anything back because before being '
+    'below between both come doing done down during each either else even every example from '
+    'further give going good hello help here into just know like look make many more most much must '
+    'need never next only other over please really same says something still such sure take tell '
+    'than thank thanks then there thing things think through under very want well what when where '
+    'which while without write yourself'
+).split())
+
+
+class HeavyHitters:
+    """Weighted Misra–Gries summary: approximate largest weight sums in bounded space.
+
+    Holds at most ``2 * capacity`` terms. Every reported sum is at most
+    ``error`` below the true one, and ``error <= total weight / capacity``.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.weights: dict[str, float] = {}
+        self.error = 0.0
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def update(self, weights: dict[str, float]) -> None:
+        current = self.weights
+        for term, weight in weights.items():
+            current[term] = current.get(term, 0.0) + weight
+        if len(current) > 2 * self.capacity:
+            self._shrink()
+
+    def _shrink(self) -> None:
+        # Subtract the (capacity + 1)-th largest weight from all and drop what
+        # falls to zero; doing it in bulk keeps updates amortized O(1)
+        values = np.fromiter(self.weights.values(), dtype=np.float64, count=len(self.weights))
+        cut = float(np.partition(values, len(values) - self.capacity - 1)[len(values) - self.capacity - 1])
+        self.error += cut
+        self.weights = {term: weight - cut for term, weight in self.weights.items() if weight > cut}
+
+    def items(self) -> list[tuple[str, float]]:
+        return list(self.weights.items())
+
+
+class CountMinSketch:
+    """Fixed-size frequency estimates for strings; never below the true count."""
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, seed: int = 0):
+        if width & (width - 1):
+            raise ValueError('width must be a power of two')
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.int32)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing of Python's 64-bit string hash, one odd multiplier per row
+        self._multipliers = (rng.integers(0, 1 << 62, depth, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self._shift = np.uint64(64 - width.bit_length() + 1)
+        self._offsets = (np.arange(depth, dtype=np.int64) * width)[:, None]
+
+    def _cells(self, terms: list[str]) -> np.ndarray:
+        hashes = np.fromiter((hash(t) for t in terms), dtype=np.int64, count=len(terms)).view(np.uint64)
+        return (hashes[None, :] * self._multipliers[:, None] >> self._shift).astype(np.int64) + self._offsets
+
+    def add(self, terms: list[str]) -> None:
+        """Count each of ``terms`` once."""
+        if terms:
+            np.add.at(self.table.reshape(-1), self._cells(terms).ravel(), 1)
+
+    def estimate(self, terms: list[str]) -> np.ndarray:
+        if not terms:
+            return np.zeros(0, dtype=np.int64)
+        return self.table.reshape(-1)[self._cells(terms)].min(axis=0).astype(np.int64)
+
+
+class TopicExtractor:
+    """Streams ``(conversation, text)`` pairs and keeps the best TF-IDF terms.
+
+    Pairs should arrive grouped by conversation, as the parser emits them;
+    a conversation that is interrupted is counted as several documents.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, stop_words: Iterable[str] = STOP_WORDS):
+        self.stop_words = frozenset(stop_words)
+        self.heavy_hitters = HeavyHitters(capacity)
+        self.document_frequency = CountMinSketch()
+        self.documents = 0
+        self._conversation = None
+        self._terms: Counter = Counter()
+
+    def add(self, conversation, text: str | None) -> None:
+        """Count the terms of ``text``, one or more messages of ``conversation``."""
+        if conversation != self._conversation or len(self._terms) >= MAX_DOCUMENT_TERMS:
+            self._flush()
+            self._conversation = conversation
+        if not isinstance(text, str):
+            return
+        counts = Counter(_TOKEN.findall(text.lower()))
+        for term in counts.keys() & self.stop_words:
+            del counts[term]
+        if self._terms:
+            self._terms.update(counts)
+        else:
+            self._terms = counts
+
+    def _flush(self) -> None:
+        if not self._terms:
+            return
+        terms = list(self._terms)
+        # Sublinear term frequency, normalized so every conversation has the same say
+        weights = 1.0 + np.log(np.fromiter(self._terms.values(), dtype=np.float64, count=len(terms)))
+        weights /= weights.sum()
+        self.heavy_hitters.update(dict(zip(terms, weights.tolist())))
+        self.document_frequency.add(terms)
+        self.documents += 1
+        self._terms = Counter()
+
+    def top(self, k: int = DEFAULT_TOP_K) -> list[tuple[str, float]]:
+        """The ``k`` best ``(term, score)`` pairs, best first."""
+        self._flush()
+        candidates = self.heavy_hitters.items()
+        if not candidates:
+            return []
+        terms = [term for term, _ in candidates]
+        df = np.minimum(self.document_frequency.estimate(terms), self.documents)
+        # Smoothed IDF: terms found in every conversation still count once
+        idf = np.log((1 + self.documents) / (1 + df)) + 1.0
+        scores = np.fromiter((w for _, w in candidates), dtype=np.float64, count=len(candidates)) * idf
+        best = np.argsort(-scores, kind='stable')[:k]
+        return [(terms[i], float(scores[i])) for i in best]
+
+
+def extract_topics(messages: pd.DataFrame, k: int = DEFAULT_TOP_K, capacity: int = DEFAULT_CAPACITY) -> list[str]:
+    """Top ``k`` topic terms of a message table with ``conversation`` and ``content`` columns.
+
+    Content is converted to Python strings ``BATCH_ROWS`` rows at a time, so
+    the Arrow-backed column is never materialized at once; consecutive
+    messages of one conversation are tokenized together.
+    """
+    extractor = TopicExtractor(capacity)
+    conversation = messages['conversation'].to_numpy()
+    content = messages['content']
+    for start in range(0, len(messages), BATCH_ROWS):
+        codes = conversation[start:start + BATCH_ROWS]
+        texts = [t if isinstance(t, str) else '' for t in content.iloc[start:start + BATCH_ROWS].tolist()]
+        bounds = [0, *(np.flatnonzero(codes[1:] != codes[:-1]) + 1).tolist(), len(codes)]
+        for lo, hi in zip(bounds, bounds[1:]):
+            extractor.add(codes[lo].item(), '\n'.join(texts[lo:hi]))
+    return [term for term, _ in extractor.top(k)]
@@ -0,0 +1,57 @@
+"""Per-turn timing: how long answers take and how usage splits into sessions.
+
+Computed on whole columns with ``groupby``/``shift`` over the message table
+from :func:`chatgpt_wrapped.pipeline.load_export`, which keeps the assistant
+replies' timestamps (not their text) next to the user messages.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+SESSION_IDLE_SECONDS = 30 * 60
+
+
+def response_gaps(messages: pd.DataFrame) -> pd.Series:
+    """Seconds from each user message to the assistant reply that follows it.
+
+    Messages are ordered by time within their conversation (ties keep table
+    order); a user message followed by another user message, or by nothing,
+    has no gap. The result is indexed like ``messages``.
+    """
+    ordered = messages[['conversation', 'role', 'timestamp']].sort_values(['conversation', 'timestamp'], kind='stable')
+    following = ordered.groupby('conversation', sort=False)[['role', 'timestamp']].shift(-1)
+    is_turn = ((ordered['role'] == 'user') & (following['role'] == 'assistant')).to_numpy(dtype=bool)
+    gaps = following['timestamp'][is_turn] - ordered['timestamp'][is_turn]
+    return gaps.astype(np.int64).sort_index().rename('response_gap')
+
+
+def sessions(messages: pd.DataFrame, idle_seconds: int = SESSION_IDLE_SECONDS) -> pd.DataFrame:
+    """Split the user's activity into sessions separated by more than ``idle_seconds``.
+
+    Sessions span conversations. One row per session in time order:
+    ``start`` and ``end`` (epoch seconds of the first and last user message),
+    ``messages`` and ``conversations`` (distinct conversations touched).
+    """
+    user = messages.loc[messages['role'] == 'user', ['conversation', 'timestamp']].sort_values('timestamp', kind='stable')
+    timestamp = user['timestamp']
+    session = (timestamp - timestamp.shift(1) > idle_seconds).cumsum().to_numpy()
+    return user.groupby(session).agg(
+        start=('timestamp', 'min'),
+        end=('timestamp', 'max'),
+        messages=('timestamp', 'size'),
+        conversations=('conversation', 'nunique'),
+    ).rename_axis('session')
+
+
+def turn_stats(messages: pd.DataFrame, idle_seconds: int = SESSION_IDLE_SECONDS) -> dict:
+    """Headline turn metrics as plain numbers (NaN when there is nothing to measure)."""
+    gaps = response_gaps(messages)
+    table = sessions(messages, idle_seconds)
+    return {
+        'median_response_seconds': float(gaps.median()) if len(gaps) else float('nan'),
+        'sessions': len(table),
+        'avg_session_minutes': float((table['end'] - table['start']).mean() / 60) if len(table) else float('nan'),
+        'avg_messages_per_session': float(table['messages'].mean()) if len(table) else float('nan'),
+    }
@@ -1,23 +1,53 @@
 from __future__ import annotations
 
-import json
+import io
 import os
+import time
 import requests
 
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 
+from chatgpt_wrapped import HistoryStore, ResponseCache, ResultCache, content_hash, make_executor
+from chatgpt_wrapped.insights import (
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RETRIES,
+    IncompleteSummary,
+    MAP_INSTRUCTION,
+    REDUCE_INSTRUCTION,
+    SYSTEM_INSTRUCTION,
+    cached_generate,
+    gemini_generate,
+    http_generate,
+    summarize_history_sync,
+    try_parse_json,
+)
+from chatgpt_wrapped.charts import DailyLevels
+from chatgpt_wrapped.instrument import Instrumentation, throttle
+from chatgpt_wrapped.jobs import (
+    DEFAULT_MAX_PENDING,
+    DEFAULT_MAX_WAIT,
+    DEFAULT_WORKERS,
+    JobQueue,
+    QueueFull,
+    RateLimiter,
+    RequestLimitExceeded,
+)
+from chatgpt_wrapped.pipeline import describe, histograms, load_export, quick_stats, usage_patterns, user_messages
+from chatgpt_wrapped.prompt import DEFAULT_TOKEN_BUDGET, build_prompt
+from chatgpt_wrapped.search import SearchIndex, snippets
+from chatgpt_wrapped.topics import extract_topics
+from chatgpt_wrapped.turns import turn_stats
+
 # Load environment variables from .env file (for local development)
 load_dotenv()
 
 # ────────────────────────  Request Capping  ──────────────────────────
-# Initialize session state for request counting
-if 'request_count' not in st.session_state:
-    st.session_state.request_count = 0
-
-# Get the request limit from environment variable or default to 500
+# Model and image API calls allowed per REQUEST_WINDOW_HOURS, across all sessions (0 = no cap)
 REQUEST_LIMIT = int(os.getenv('REQUEST_LIMIT', '500'))
+REQUEST_WINDOW_HOURS = float(os.getenv('REQUEST_WINDOW_HOURS', '24'))
 
 # ────────────────────────  Page setup  ──────────────────────────
 st.set_page_config(page_title='ChatGPT Wrapped', page_icon='🤖', layout='centered')
@@ -72,141 +102,201 @@ st.markdown(
         '1. On chatgpt.com click on your 👤 User Icon and click on ⚙️ Settings \n'
         '2. Click on Data and Controls and "Export data" and confirm export \n'
         '3. Wait for the Email from OpenAI and Download the data export \n'
-        '4. Unzip the file and drag the conversations.json file below'
+        '4. Drag the downloaded .zip (or the conversations.json inside it) below'
     )
 
-uploaded_file = st.file_uploader('Upload conversations.json', type=['json'])
+# The export zip is read in place: conversations.json is decompressed while it is parsed
+uploaded_file = st.file_uploader('Upload the export .zip or conversations.json', type=['zip', 'json'])
 
 if uploaded_file is None:
     st.info('Upload the conversations file to begin.')
     st.stop()
 
-# ────────────────────────  Load & normalize  ────────────────────
-raw = json.load(uploaded_file)
+# ────────────────────────  Result cache  ──────────────────────────
+CACHE_TTL_HOURS = float(os.getenv('CACHE_TTL_HOURS', '24'))
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    # Shared by every session in this process; the disk tier survives restarts
+    return ResultCache(
+        os.getenv('CACHE_DIR', '.cache/wrapped'),
+        max_memory_bytes=int(os.getenv('CACHE_MEMORY_MB', '1024')) * 1024 * 1024,
+        max_disk_bytes=int(os.getenv('CACHE_MAX_MB', '2048')) * 1024 * 1024,
+        ttl_seconds=CACHE_TTL_HOURS * 3600,
+    )
+
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    # Paid model answers (insight JSON, portraits), shared across sessions and restarts
+    return ResponseCache(
+        os.getenv('RESPONSE_CACHE_DIR', '.cache/responses'),
+        ttl_seconds=float(os.getenv('RESPONSE_CACHE_TTL_HOURS', '168')) * 3600,
+        max_disk_bytes=int(os.getenv('RESPONSE_CACHE_MAX_MB', '256')) * 1024 * 1024,
+    )
+
+
+@st.cache_resource
+def get_history_store() -> HistoryStore | None:
+    # Each user's last upload, so a newer export only parses the conversations that changed.
+    # Off unless configured: it keeps message text on disk until evicted
+    directory = os.getenv('HISTORY_DIR', '')
+    if not directory:
+        return None
+    return HistoryStore(directory, max_disk_bytes=int(os.getenv('HISTORY_MAX_MB', '2048')) * 1024 * 1024)
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    # Insights and portraits of every session run here, so the page never waits on them
+    return JobQueue(
+        workers=int(os.getenv('JOB_WORKERS', str(DEFAULT_WORKERS))),
+        max_pending=int(os.getenv('JOB_QUEUE_SIZE', str(DEFAULT_MAX_PENDING))),
+    )
+
+
+@st.cache_resource
+def get_request_limiter() -> RateLimiter:
+    # One cap for the whole server, not per session
+    return RateLimiter(REQUEST_LIMIT, REQUEST_WINDOW_HOURS * 3600)
+
+
+@st.cache_resource
+def get_parse_executor():
+    # One process pool for the whole server so workers are spawned only once
+    return make_executor(int(os.getenv('PARSE_WORKERS', '0')) or None)
 
-# Handle the new export format - list of conversations with mapping
-if isinstance(raw, list):
-    convos = raw
-else:
-    # Fallback for old format
-    convos = raw['conversations'] if isinstance(raw, dict) and 'conversations' in raw else raw
 
+# Exports above this size are normalized across a process pool
+PARALLEL_PARSE_BYTES = int(os.getenv('PARALLEL_PARSE_MB', '64')) * 1024 * 1024
 
+# Progress bar / status updates per second; each update is a round trip to the browser
+PROGRESS_UPDATES_PER_SECOND = 4
 
+# Optional JSON-lines file that receives the timings of every run
+PERF_LOG = os.getenv('PERF_LOG')
+
+result_cache = get_result_cache()
+response_cache = get_response_cache()
+history_store = get_history_store()
+job_queue = get_job_queue()
+request_limiter = get_request_limiter()
+
+# Wall/CPU time and peak RSS of every stage and API call in this run
+perf = Instrumentation()
+
+with perf.stage('hash') as record:
+    # Hashing reads the whole upload; every rerun with the same file reuses the digest
+    hashed = st.session_state.get('upload_hash')
+    record['cached'] = hashed is not None and hashed[0] == uploaded_file.file_id
+    if not record['cached']:
+        hashed = st.session_state['upload_hash'] = (uploaded_file.file_id, content_hash(uploaded_file))
+    upload_hash = hashed[1]
+
+# ────────────────────────  Load & normalize  ────────────────────
 # Create progress bar
 progress_bar = st.progress(0)
 status_text = st.empty()
 status_text.text("📊 Parsing conversations and calculating statistics...")
 
-rows: list[dict] = []
-total_convos = len(convos)
 
-for i, convo in enumerate(convos):
-    # Update progress bar
-    progress = (i + 1) / total_convos
-    progress_bar.progress(progress)
-    status_text.text(f"📊 Processing conversation {i + 1} of {total_convos}...")
-    
-    convo_id = convo.get('id') or convo.get('conversation_id')
-    
-    # Handle the new mapping structure
-    if 'mapping' in convo and isinstance(convo['mapping'], dict):
-        messages = []
-        for node_id, node in convo['mapping'].items():
-            if node.get('message') and isinstance(node['message'], dict):
-                messages.append(node['message'])
-    else:
-        # Fallback for old format
-        messages = (
-            convo.get('mapping', {}).values() if 'mapping' in convo else convo.get('messages', [])
-        )
-    
-    for m in messages:
-        if not isinstance(m, dict):
-            continue
-            
-        role = (
-            m.get('author', {}).get('role') if 'author' in m else m.get('role', '')
-        )
-        
-        # More robust content extraction for new format
-        content = ''
-        if m.get('content') and isinstance(m.get('content'), dict):
-            content_obj = m.get('content', {})
-            if content_obj.get('content_type') == 'text' and content_obj.get('parts'):
-                content = content_obj.get('parts', [''])[0] or ''
-            elif isinstance(content_obj.get('text'), str):
-                content = content_obj.get('text', '')
-        elif m.get('text'):
-            content = m.get('text')
-        elif m.get('message') and isinstance(m.get('message'), dict):
-            message_content = m.get('message', {}).get('content', {})
-            if isinstance(message_content, dict) and message_content.get('parts'):
-                content = message_content.get('parts', [''])[0] or ''
-            elif isinstance(message_content, str):
-                content = message_content
-        elif isinstance(m.get('content'), str):
-            content = m.get('content', '')
-        
-        ts = m.get('create_time') or m.get('timestamp')
-        if ts is None:
-            continue
-        rows.append(
-            {
-                'conversation_id': convo_id,
-                'role': role,
-                'content': content,
-                'timestamp': float(ts),
-            }
-        )
+def report_progress(fraction: float, n_convos: int) -> None:
+    # Reserve the last 10% for the DataFrame and statistics steps
+    progress_bar.progress(fraction * 0.9)
+    status_text.text(f"📊 Processing conversation {n_convos}...")
+
+
+def load_upload() -> dict:
+    # Stream the export one conversation at a time; only user messages are kept
+    use_pool = (os.cpu_count() or 1) > 1
+    return (history_store.ingest if history_store is not None else load_export)(
+        uploaded_file,
+        progress=throttle(report_progress, 1 / PROGRESS_UPDATES_PER_SECOND),
+        executor=get_parse_executor() if use_pool else None,
+        parallel_bytes=PARALLEL_PARSE_BYTES,
+    )
+
+
+try:
+    with perf.stage('normalize') as record:
+        misses = result_cache.misses
+        loaded = result_cache.get_or_compute(upload_hash, 'normalize', load_upload)
+        record['cached'] = result_cache.misses == misses
+except ValueError as e:
+    print(f"Console: Failed to parse export: {e}")
+    st.error('Could not read the uploaded file – make sure it is your data export .zip or the conversations.json from it.')
+    st.stop()
+
+df = loaded['df']
 
 # Update progress for final calculations
 status_text.text("📊 Creating DataFrame and calculating statistics...")
 progress_bar.progress(0.9)
 
-if not rows:
+if not loaded['messages_seen']:
     st.error('Could not find any messages in the uploaded file – check the export.')
     st.stop()
 
-# DataFrame & quick derives
-df = pd.DataFrame(rows)
-df['dt'] = pd.to_datetime(df['timestamp'], unit='s')
-user_df = df[df['role'] == 'user'].copy()
-user_df['date'] = user_df['dt'].dt.date
-user_df['word_count'] = user_df['content'].str.split().str.len()
-
-# Add more derived columns for additional metrics
-user_df['day_of_week'] = user_df['dt'].dt.day_name()
-user_df['hour'] = user_df['dt'].dt.hour
-user_df['month'] = user_df['dt'].dt.month_name()
-user_df['is_weekend'] = user_df['dt'].dt.weekday >= 5
 
 # ────────────────────────  Descriptive stats  ───────────────────
+with perf.stage('stats') as record:
+    misses = result_cache.misses
+    stats = result_cache.get_or_compute(upload_hash, 'stats', lambda: describe(df))
+    record['cached'] = result_cache.misses == misses
+# Rebuilt from the cached table rather than cached again next to it
+user_df = user_messages(df)
+
 if user_df.empty:
     st.error('No user messages were detected.')
     st.stop()
 
-daily_counts = user_df.groupby('date').size()
-conv_lengths = user_df.groupby('conversation_id').size()
-total_words = user_df['word_count'].sum()
+with perf.stage('turns') as record:
+    misses = result_cache.misses
+    turns = result_cache.get_or_compute(upload_hash, 'turns', lambda: turn_stats(df))
+    record['cached'] = result_cache.misses == misses
+
+with perf.stage('report'):
+    summary_stats = quick_stats(stats, loaded['total_convos'])
+    patterns = usage_patterns(stats)
+    charts = histograms(stats)
 
 # Complete the progress bar
 progress_bar.progress(1.0)
 status_text.empty()  # Clear the status text
 
+with st.sidebar.expander('Cache'):
+    cache_stats = result_cache.stats()
+    st.caption(
+        f"Upload {upload_hash[:12]} · "
+        f"{cache_stats['memory_hits']} memory hits · {cache_stats['disk_hits']} disk hits · "
+        f"{cache_stats['misses']} misses · {cache_stats['disk_bytes'] / 1e6:.1f} MB on disk"
+    )
+    response_stats = response_cache.stats()
+    st.caption(
+        f"Model responses: {response_stats['hits']} hits · {response_stats['misses']} misses · "
+        f"{response_stats['disk_bytes'] / 1e6:.1f} MB on disk"
+    )
+    delta = loaded.get('delta')
+    if delta is not None:
+        st.caption(
+            f"History: {delta['reused']} conversations reused · {delta['parsed']} parsed · "
+            f"{delta['removed']} no longer in the export"
+        )
+
 st.header('📊 Quick Stats')
 col1, col2, col3 = st.columns(3)
-col1.metric('Total requests', len(user_df))
-col2.metric('Total conversations', len(convos))
-col3.metric('Avg. requests / day', f'{daily_counts.mean():.1f}')
+col1.metric('Total requests', summary_stats['total_requests'])
+col2.metric('Total conversations', summary_stats['total_conversations'])
+col3.metric('Avg. requests / day', f"{summary_stats['avg_requests_per_day']:.1f}")
 
 col1, col2, col3 = st.columns(3)
-col1.metric('Avg. words / request', f'{user_df.word_count.mean():.1f}')
-col2.metric('Total words written', f'{total_words:,}')
-col3.metric('Max requests in a day', int(daily_counts.max()))
+col1.metric('Avg. words / request', f"{summary_stats['avg_words_per_request']:.1f}")
+col2.metric('Total words written', f"{summary_stats['total_words']:,}")
+col3.metric('Max requests in a day', summary_stats['max_requests_in_a_day'])
 
 col1, col2, col3 = st.columns(3)
-col1.metric('Avg. conversation length', f'{conv_lengths.mean():.1f} user msgs')
+col1.metric('Avg. conversation length', f"{summary_stats['avg_conversation_length']:.1f} user msgs")
 col2.write('')  # Empty space for spacing
 col3.write('')  # Empty space for spacing
 
@@ -215,194 +305,254 @@ st.header('📈 Usage Patterns')
 
 # Time-based metrics
 col1, col2, col3 = st.columns(3)
+col1.metric('Most active day', patterns['most_active_day'])
+col2.metric('Peak hour', f"{patterns['peak_hour']}:00")
+col3.metric('Busiest month', patterns['busiest_month'])
 
-most_active_day = user_df['day_of_week'].value_counts().index[0]
-col1.metric('Most active day', most_active_day)
-
-most_active_hour = user_df['hour'].value_counts().index[0]
-col2.metric('Peak hour', f'{most_active_hour}:00')
-
-busiest_month = user_df['month'].value_counts().index[0]
-col3.metric('Busiest month', busiest_month)
+# Sessions are runs of requests less than 30 minutes apart
+col1, col2, col3 = st.columns(3)
+col1.metric('Sessions', f"{turns['sessions']:,}")
+col2.metric('Avg. session length', f"{turns['avg_session_minutes']:.0f} min")
+# NaN when no request got a timestamped answer
+median_response = turns['median_response_seconds']
+col3.metric('Median answer time', '–' if pd.isna(median_response) else f"{median_response:.0f} s")
 
 
 # Daily requests chart
-st.subheader('Requests per Day')
-st.bar_chart(daily_counts)
+# Long histories are drawn per week or month; zooming in brings the days back
+daily_levels = DailyLevels(stats['daily_counts'])
+first_day, last_day = daily_levels.span
+if first_day < last_day:
+    chart_range = st.slider('Date range', min_value=first_day, max_value=last_day, value=(first_day, last_day), format='YYYY-MM-DD')
+else:
+    chart_range = (first_day, last_day)
+level, requests_over_time = daily_levels.view(*chart_range)
+st.subheader(f'Requests per {level.title()}')
+st.bar_chart(requests_over_time)
 
 # Day of week distribution
 st.subheader('Activity by Day of Week')
-day_counts = user_df['day_of_week'].value_counts()
-st.bar_chart(day_counts)
+st.bar_chart(charts['day_of_week'])
 
 # Hour distribution
 st.subheader('Activity by Hour of Day')
-hour_counts = user_df['hour'].value_counts().sort_index()
-st.bar_chart(hour_counts)
+st.bar_chart(charts['hour'])
+
+# ────────────────────────  Search  ──────────────────────────────
+st.header('🔎 Search Your Messages')
+query = st.text_input('Search your requests', placeholder='pandas merge · "exact phrase" · pand*')
+if query.strip():
+    # Built on the first search of an upload, then cached with the parsed data
+    with perf.stage('search_index') as record:
+        misses = result_cache.misses
+        search_index = SearchIndex.from_entry(
+            result_cache.get_or_compute(upload_hash, 'search', lambda: SearchIndex.build(df).to_entry())
+        )
+        record['cached'] = result_cache.misses == misses
+    if first_day < last_day:
+        search_range = st.slider('Search dates', min_value=first_day, max_value=last_day, value=(first_day, last_day), format='YYYY-MM-DD')
+    else:
+        search_range = (first_day, last_day)
+    with perf.stage('search'):
+        hits = search_index.search(df, query, *search_range, roles=['user'])
+        matches = snippets(df, hits)
+    st.caption(f"{hits['count']:,} matching requests")
+    if hits['count']:
+        level, hits_over_time = DailyLevels(hits['daily_counts']).view(*search_range)
+        st.subheader(f'Matches per {level.title()}')
+        st.bar_chart(hits_over_time)
+        st.subheader('Most Recent Matches')
+        for match in matches.itertuples():
+            st.markdown(f"**{pd.to_datetime(match.timestamp, unit='s'):%Y-%m-%d}** · {match.snippet}")
+
+# ────────────────────────  Background jobs  ─────────────────────
+# Model and image calls run in the shared job queue; the page renders without
+# waiting and a fragment polls until the result is in, then reruns the page
+JOB_POLL_SECONDS = 1.0
+
+
+def run_job(name: str, fn):
+    """Worker side: run ``fn(job_perf)`` and return its value with the job's timing records."""
+    job_perf = Instrumentation()
+    with job_perf.stage(name, kind='job'):
+        value = fn(job_perf)
+    return value, job_perf.records
+
+
+def submit_job(name: str, key: str, fn) -> bool:
+    """Queue the job ``key`` for this session unless it already is; False while the queue is full."""
+    futures = st.session_state.setdefault('jobs', {})
+    if key not in futures:
+        try:
+            futures[key] = job_queue.submit(key, run_job, name, fn)
+        except QueueFull:
+            return False
+    return True
+
+
+def background(name: str, key: str, fn) -> tuple[bool, object]:
+    """``(True, result)`` once the job ``key`` has finished, else ``(False, None)`` with the job queued.
+
+    Results are kept in the session, so later reruns neither resubmit nor wait.
+    """
+    results = st.session_state.setdefault('job_results', {})
+    if key in results:
+        return True, results[key]
+    if not submit_job(name, key, fn):
+        # wait_for retries the submit on its next poll
+        return False, None
+    futures = st.session_state['jobs']
+    future = futures[key]
+    if not future.done():
+        return False, None
+    del futures[key]
+    try:
+        value, records = future.result()
+    except Exception as e:
+        print(f"Console: Background job {name} failed: {e}")
+        value, records = None, []
+    # The job's own stages and API calls show up in this run's timings
+    perf.records.extend(records)
+    results[key] = value
+    return True, value
+
+
+def wait_for(name: str, key: str, fn, message: str) -> None:
+    """Show ``message`` until the job ``key`` finishes, then rerun the page to render it."""
+    @st.fragment(run_every=JOB_POLL_SECONDS)
+    def poll():
+        # A full queue is retried here, on the poll interval; only a finished job reruns the page
+        if not submit_job(name, key, fn):
+            st.info('⏳ The server is busy; your request is waiting for a free slot.')
+            return
+        if st.session_state['jobs'][key].done():
+            st.rerun()
+        st.info(message)
+
+    poll()
+
 
 # ────────────────────────  LLM‑powered insights  ────────────────
 st.header('🤖 AI-Powered Insights')
 
-# Extract the user messages from the df and join them into a new string, seperated by a line break between each message and two line breaks between each conversation
-# Also truncate the messages to 70 words
-messages_string = ''
-conversation_id = user_df['conversation_id'].iloc[0]
-for i in range(len(user_df)):
-    if user_df['conversation_id'].iloc[i] != conversation_id:
-        messages_string += '\n\n'
-        conversation_id = user_df['conversation_id'].iloc[i]
-    
-    content = user_df['content'].iloc[i]
-    words = content.split()
-    if len(words) > 100:
-        # Truncate to 70 words and join back
-        truncated_content = ' '.join(words[:100])
-        messages_string += truncated_content + '\n'
-    else:
-        messages_string += content + '\n'
+# Prompt size cap; longer histories are sampled evenly across months
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', str(DEFAULT_TOKEN_BUDGET)))
+
+# Histories longer than one chunk are summarized in parallel pieces (map-reduce)
+INSIGHTS_CHUNK_TOKENS = int(os.getenv('INSIGHTS_CHUNK_TOKENS', str(DEFAULT_CHUNK_TOKENS)))
+INSIGHTS_CONCURRENCY = int(os.getenv('INSIGHTS_CONCURRENCY', str(DEFAULT_CONCURRENCY)))
+INSIGHTS_RETRIES = int(os.getenv('INSIGHTS_RETRIES', str(DEFAULT_RETRIES)))
+# Optional HTTP model endpoints used instead of Gemini and FLUX
+INSIGHTS_MODEL_URL = os.getenv('INSIGHTS_MODEL_URL')
+IMAGE_MODEL_URL = os.getenv('IMAGE_MODEL_URL')
 
 # Check if Gemini API key is available
 gemini_api_key = os.getenv('GEMINI_API_KEY')
-if not gemini_api_key:
+if not gemini_api_key and not INSIGHTS_MODEL_URL:
     st.warning('⚠️ Gemini API key not found. To enable AI insights, set the GEMINI_API_KEY environment variable.')
 else:
-    # Initialize variables
-    summary = ""
-    topics = []
-    
-    # Automatically generate AI insights
-    with st.spinner('🤖 Analyzing your chat history...'):
+    # One line per user message (truncated to 100 words), a blank line between conversations
+    with perf.stage('prompt'):
+        messages_string = build_prompt(user_df, words_per_message=100, token_budget=PROMPT_TOKEN_BUDGET)
+
+    # Answers are cached per model, parameters and prompt; a hit skips the job entirely
+    insights_model_id = INSIGHTS_MODEL_URL or "gemini-1.5-flash"
+    insights_params = {
+        'temperature': 0.1,
+        'chunk_tokens': INSIGHTS_CHUNK_TOKENS,
+        'instructions': [SYSTEM_INSTRUCTION, MAP_INSTRUCTION, REDUCE_INSTRUCTION],
+    }
+    insights_key = response_cache.key(insights_model_id, insights_params, messages_string)
+    cached_insights = response_cache.get_json(insights_key)
+    # Chunks of a re-uploaded history that did not change are answered from the per-user cache
+    delta = loaded.get('delta')
+    call_cache = history_store.responses(delta['user']) if delta is not None else response_cache
+
+    def generate_insights(job_perf: Instrumentation) -> dict:
+        """Summary and topics from the model, or from the data when its answer cannot be used."""
         try:
-            import google.generativeai as genai
-            
-            # Configure the API key
-            genai.configure(api_key=gemini_api_key)
-            
-            # Create the model with system instruction
-            model = genai.GenerativeModel(
-                model_name="gemini-1.5-flash",
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.1,  # Low temperature for more deterministic output
-                ),
-                system_instruction="""
-                    You are a helpful assistant that is worldclass at parsing large amounts of data and deriving insights from them. 
-                    You are going to be given a string of data that contains all the messages from a user's chat history with ChatGPT.
-                    You're task is to write a 4 sentence summary of the user based on the chat history and provide 10 the most prominent topics in the total chat history.
-                    Do not overemphasize recent topics, focus on the overall usage patterns and trends.
-                    
-                    CRITICAL: You must respond with ONLY valid JSON in exactly this format, with no additional text, markdown, or formatting:
-                    {
-                        "summary": "Your 4 sentence summary here",
-                        "topics": ["topic1", "topic2", "topic3", "topic4", "topic5", "topic6", "topic7", "topic8", "topic9", "topic10"]
-                    }
-                    
-                    IMPORTANT RULES:
-                    1. Start your response with { and end with }
-                    2. Use double quotes for all strings and keys
-                    3. Do not include any text before or after the JSON
-                    4. Do not use markdown formatting like ```json
-                    5. Ensure all strings are properly escaped
-                    6. The summary should be exactly 4 sentences
-                    7. The topics array should contain exactly 10 topics
-                    8. Do not include any comments or explanations
-                    9. Make sure all quotes are properly closed
-                    10. Use simple, clear topic names (1-3 words each)
-                    
-                    Example of valid response:
-                    {"summary": "This user frequently asks for help with programming and technical questions. They seem to be working on various software projects and learning new technologies. The user often requests code examples and explanations for complex concepts. They appear to be a developer or student interested in improving their technical skills.", "topics": ["programming", "code examples", "technical questions", "software development", "learning", "debugging", "algorithms", "web development", "data structures", "best practices"]}
-                    
-                    Do not include any other text, explanations, or formatting. Only the JSON object.
-                    """
-            )
-            
-            # Generate insights based on the user's data
-            response = model.generate_content(f"{messages_string}")
-            
-            # Parse JSON response with automatic fallback handling (errors logged to console only)
-            response_data = None
-            
-            if not response or not hasattr(response, 'text'):
-                print("Console: No response received from Gemini API")
-                response_data = None
+            if INSIGHTS_MODEL_URL:
+                # Local or self-hosted endpoint (e.g. python -m chatgpt_wrapped.stub_model)
+                generate = http_generate(INSIGHTS_MODEL_URL)
             else:
-                response_text = response.text.strip()
-                
-                if not response_text:
-                    print("Console: Empty response received from Gemini API")
-                    response_data = None
-                else:
-                    import re
-                    
-                    def try_parse_json(text):
-                        """Try to parse JSON with multiple strategies"""
-                        strategies = [
-                            # Strategy 1: Direct parsing
-                            lambda t: json.loads(t),
-                            
-                            # Strategy 2: Remove markdown code blocks
-                            lambda t: json.loads(re.sub(r'```json\s*|```\s*', '', t).strip()),
-                            
-                            # Strategy 3: Extract JSON with regex and clean
-                            lambda t: json.loads(re.search(r'\{.*\}', t, re.DOTALL).group(0).strip()),
-                            
-                            # Strategy 4: Fix quotes and try again
-                            lambda t: json.loads(re.sub(r'```json\s*|```\s*', '', t).strip().replace("'", '"')),
-                            
-                            # Strategy 5: More aggressive cleaning
-                            lambda t: json.loads(re.sub(r'```json\s*|```\s*|^[^{]*|[^}]*$', '', t, flags=re.MULTILINE).strip()),
-                        ]
-                        
-                        for i, strategy in enumerate(strategies):
-                            try:
-                                result = strategy(text)
-                                print(f"Console: JSON parsed successfully using strategy {i+1}")
-                                return result
-                            except Exception as e:
-                                print(f"Console: Strategy {i+1} failed: {str(e)}")
-                                continue
-                        
-                        print("Console: All JSON parsing strategies failed")
-                        return None
-                    
-                    response_data = try_parse_json(response_text)
-            
-            # Always display insights in a clean, user-friendly way
+                import google.generativeai as genai
+
+                # Configure the API key
+                genai.configure(api_key=gemini_api_key)
+                generate = gemini_generate(model_name=insights_model_id, temperature=insights_params['temperature'])
+            # Every model call (map, reduce and retries) gets its own record and takes a request slot;
+            # calls answered from the cache take neither
+            generate = request_limiter.wrap_async(job_perf.wrap_async(generate, insights_model_id))
+            generate = cached_generate(generate, call_cache, insights_model_id, {'temperature': insights_params['temperature']})
+
+            # One call for short histories; otherwise chunks are summarized concurrently and merged
+            coverage = None
+            try:
+                response_text = summarize_history_sync(
+                    messages_string,
+                    generate,
+                    chunk_tokens=INSIGHTS_CHUNK_TOKENS,
+                    concurrency=INSIGHTS_CONCURRENCY,
+                    retries=INSIGHTS_RETRIES,
+                )
+            except IncompleteSummary as e:
+                # Shown, but not cached: a later run may summarize the missing chunks
+                print(f"Console: {e}")
+                response_text, coverage = e.text, [e.summarized, e.total]
+
+            # Parse JSON response with automatic fallback handling (errors logged to console only)
+            response_data = try_parse_json(response_text)
+            if response_data and coverage is None:
+                response_cache.put_json(insights_key, response_data)
             if response_data:
-                # AI-generated insights
-                topics = response_data.get('topics', [])
-                summary = response_data.get('summary', '')
-            else:
-                # Fallback to data-driven insights
-                print("Console: Using fallback analysis due to parsing failure")
-                
-                # Generate basic insights from the data
-                total_messages = len(user_df)
-                avg_words = user_df['word_count'].mean()
-                most_active_hour = user_df['hour'].value_counts().index[0]
-                most_active_day = user_df['day_of_week'].value_counts().index[0]
-                
-                summary = f"This user has sent {total_messages} messages to ChatGPT with an average of {avg_words:.1f} words per message. They are most active during {most_active_hour}:00 and prefer {most_active_day}s for their conversations. The user appears to be engaged in regular communication with the AI assistant."
-                
-                # Extract potential topics from message content
-                all_words = ' '.join(user_df['content'].astype(str)).lower()
-                common_words = pd.Series(all_words.split()).value_counts().head(20)
-                
-                # Filter out common stop words
-                stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his', 'her', 'its', 'our', 'their', 'mine', 'yours', 'his', 'hers', 'ours', 'theirs'}
-                topics = [word for word in common_words.index if word not in stop_words and len(word) > 3][:10]
+                return {**response_data, 'coverage': coverage} if coverage else response_data
+
+            # Fallback to data-driven insights
+            print("Console: Using fallback analysis due to parsing failure")
+
+            # Generate basic insights from the data
+            total_messages = summary_stats['total_requests']
+            avg_words = summary_stats['avg_words_per_request']
+            most_active_hour = patterns['peak_hour']
+            most_active_day = patterns['most_active_day']
+
+            summary = f"This user has sent {total_messages} messages to ChatGPT with an average of {avg_words:.1f} words per message. They are most active during {most_active_hour}:00 and prefer {most_active_day}s for their conversations. The user appears to be engaged in regular communication with the AI assistant."
+
+            # Extract potential topics from message content, in bounded memory
+            with job_perf.stage('topics'):
+                topics = extract_topics(user_df, k=10)
+            return {'summary': summary, 'topics': topics}
 
         except Exception as e:
             print(f"Console: Error generating AI insights: {str(e)}")
             # Fallback to basic data analysis if API completely fails
-            summary = f"You've sent {len(user_df)} messages with an average of {user_df['word_count'].mean():.1f} words per message. You're most active at {user_df['hour'].value_counts().index[0]}:00 on {user_df['day_of_week'].value_counts().index[0]}s."
-            topics = []
+            summary = f"You've sent {summary_stats['total_requests']} messages with an average of {summary_stats['avg_words_per_request']:.1f} words per message. You're most active at {patterns['peak_hour']}:00 on {patterns['most_active_day']}s."
+            return {'summary': summary, 'topics': [], 'limited': isinstance(e, RequestLimitExceeded)}
+
+    with perf.stage('insights', cached=cached_insights is not None):
+        if cached_insights is not None:
+            ready, response_data = True, cached_insights
+        else:
+            ready, response_data = background('insights', insights_key, generate_insights)
 
-    # Display user summary with nice formatting (outside spinner)
+    if not ready:
+        wait_for('insights', insights_key, generate_insights, '🤖 Analyzing your chat history… the stats above are ready to explore meanwhile.')
+        summary, topics = '', []
+    else:
+        topics = response_data.get('topics', [])
+        summary = response_data.get('summary', '')
+        if response_data.get('coverage'):
+            summarized, total = response_data['coverage']
+            st.info(f'These insights cover {summarized} of {total} parts of your history; the rest could not be summarized this time.')
+        if response_data.get('limited'):
+            st.info('The AI request limit for this server has been reached, so these insights come from your statistics only.')
+
+    # Display user summary with nice formatting
     if summary:
         st.subheader('📝 Your ChatGPT Usage Profile')
         st.markdown(f"*{summary}*")
     
-    # Display topics with nice formatting (outside spinner)  
+    # Display topics with nice formatting
     if topics:
         st.subheader('🔍 Your Main Discussion Topics')
         
@@ -412,39 +562,86 @@ else:
             with cols[i % 2]:
                 st.markdown(f"• **{topic.title()}**")
     
-    # Generate AI portrait if available (separate spinner)
+    # Generate AI portrait if available (its own job, once the summary is in)
     if summary:
         api_token = os.environ.get("HF_API_TOKEN")
-        if api_token:
-            from huggingface_hub import InferenceClient
-            from PIL import Image
+        if api_token or IMAGE_MODEL_URL:
+            MODEL_ID = IMAGE_MODEL_URL or "black-forest-labs/FLUX.1-dev"
+            IMAGE_PARAMS = {'guidance_scale': 3.5, 'num_inference_steps': 28, 'height': 1024, 'width': 1024}
 
-            MODEL_ID = "black-forest-labs/FLUX.1-dev"
-            IMG_PATH = "output.png"
+            # Enhanced prompt for better results with Flux
+            enhanced_prompt = f"Generate a drawning of a male in a setting that showcases the man's personality, interests by sourounding him with objects that refelct his interestsbased based on the following description and the following interests: {summary}, {topics}"
+            image_key = response_cache.key(MODEL_ID, IMAGE_PARAMS, enhanced_prompt)
 
-            with st.spinner('🎨 Generating your AI portrait…'):
+            def generate_portrait(job_perf: Instrumentation) -> bytes | None:
+                """PNG bytes of the portrait, or None when it could not be made."""
                 try:
-                    client = InferenceClient(model=MODEL_ID, token=api_token, timeout=180)
-                    
-                    # Enhanced prompt for better results with Flux
-                    enhanced_prompt = f"Generate a drawning of a male in a setting that showcases the man's personality, interests by sourounding him with objects that refelct his interestsbased based on the following description and the following interests: {summary}, {topics}"
-
-                    img = client.text_to_image(
-                        prompt=enhanced_prompt,
-                        guidance_scale=3.5,
-                        num_inference_steps=28,
-                        height=1024,
-                        width=1024,
-                    )
-                    img.save(IMG_PATH)
-                    st.subheader("🎨 Your AI‑Generated Drawing")
-                    st.image(IMG_PATH)
+                    request_limiter.acquire(DEFAULT_MAX_WAIT)
+                    with job_perf.stage(MODEL_ID, kind='api'):
+                        if IMAGE_MODEL_URL:
+                            # Local or self-hosted endpoint (e.g. the stub model's /image route)
+                            response = requests.post(IMAGE_MODEL_URL, json={'prompt': enhanced_prompt, **IMAGE_PARAMS}, timeout=180)
+                            response.raise_for_status()
+                            png = response.content
+                        else:
+                            from huggingface_hub import InferenceClient
+
+                            client = InferenceClient(model=MODEL_ID, token=api_token, timeout=180)
+                            img = client.text_to_image(prompt=enhanced_prompt, **IMAGE_PARAMS)
+                            # Kept in memory and in the per-prompt cache entry, never in a shared file
+                            buffer = io.BytesIO()
+                            img.save(buffer, format='PNG')
+                            png = buffer.getvalue()
+                    response_cache.put_image(image_key, png)
+                    return png
                 except Exception as e:
                     print(f"Console: Image generation error: {e}")
-                    st.info("Image generation is temporarily unavailable.")
+                    return None
+
+            png = response_cache.get_image(image_key)
+            ready = png is not None
+            if not ready:
+                ready, png = background('portrait', f'portrait-{image_key}', generate_portrait)
+            if not ready:
+                wait_for('portrait', f'portrait-{image_key}', generate_portrait, '🎨 Generating your AI portrait…')
+            elif png is not None:
+                st.subheader("🎨 Your AI‑Generated Drawing")
+                st.image(png)
+            else:
+                st.info("Image generation is temporarily unavailable.")
         else:
             st.info("Set the HF_API_TOKEN environment variable to enable image generation.")
 
+# ────────────────────────  Performance  ─────────────────────────
+with st.sidebar.expander('Performance'):
+    st.caption(f"{perf.total_wall_s():.2f}s in pipeline stages · upload {upload_hash[:12]}")
+    queue_stats = job_queue.stats()
+    requests_left = request_limiter.remaining()
+    st.caption(
+        f"Background jobs: {queue_stats['pending']} pending · {queue_stats['shared']} shared between sessions"
+        + (f" · {requests_left} of {REQUEST_LIMIT} API requests left" if requests_left is not None else '')
+    )
+    timings = pd.DataFrame(perf.records)
+    columns = [c for c in ('name', 'kind', 'cached', 'wall_s', 'cpu_s', 'rss_peak_mb', 'rss_delta_mb', 'error') if c in timings]
+    st.dataframe(timings[columns].round(3), hide_index=True)
+    run_info = {'upload': upload_hash, 'created': time.time()}
+    st.download_button('Download timings (JSON)', perf.to_json(**run_info), file_name=f'timings-{upload_hash[:12]}.json', mime='application/json')
+
+if PERF_LOG:
+    try:
+        with open(PERF_LOG, 'a') as log:
+            log.write(perf.to_json(indent=None, **run_info) + '\n')
+    except OSError as e:
+        print(f"Console: Could not write performance log: {e}")
+
 # ────────────────────────  Footer  ──────────────────────────────
 st.markdown("---")
-st.caption('🔒 **Privacy Notice**: Your data is processed locally. When using AI insights, message content is sent to Google Gemini API. Data sent to Google is subject to their [Privacy Policy](https://policies.google.com/privacy). No data is stored on our servers.')
+st.caption(
+    '🔒 **Privacy Notice**: Your data is processed on this server. '
+    f'The parsed upload, including your message text, is cached on the server for up to {CACHE_TTL_HOURS:g} hours '
+    'so reruns and re-uploads are fast; generated insights and portraits are cached without your messages. '
+    + ('Your user messages are also kept in a history store, without expiry, so your next export is processed faster. '
+       if history_store is not None else '')
+    + 'When using AI insights, message content is sent to Google Gemini API. '
+    'Data sent to Google is subject to their [Privacy Policy](https://policies.google.com/privacy).'
+)
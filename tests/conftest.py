@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+BASE_TIME = 1_700_000_000
+
+
+def _conversation(i: int, messages: int = 4, citations: int = 2, text: str = '') -> dict:
+    """One conversation in the exporter's key order.
+
+    Every message cites ``citations`` sources as ``[{"title": ...}, ...]``, so
+    the serialized conversation contains the ``}, {"title"`` boundary pattern
+    that also separates conversations.
+    """
+    mapping, parent = {}, None
+    for j in range(messages):
+        node_id = f'{i}-{j}'
+        mapping[node_id] = {
+            'id': node_id,
+            'message': {
+                'id': node_id,
+                'author': {'role': 'user' if j % 2 == 0 else 'assistant'},
+                'create_time': BASE_TIME + i * 3600 + j * 60,
+                'content': {'content_type': 'text', 'parts': [f'message {j} of conversation {i} {text}'.strip()]},
+                'metadata': {'citations': [{'title': f'source {k}', 'url': f'https://example.com/{k}'} for k in range(citations)]},
+            },
+            'parent': parent,
+            'children': [],
+        }
+        if parent is not None:
+            mapping[parent]['children'].append(node_id)
+        parent = node_id
+    return {
+        'title': f'Conversation {i}',
+        'create_time': BASE_TIME + i * 3600,
+        'update_time': BASE_TIME + i * 3600 + messages * 60,
+        'mapping': mapping,
+        'current_node': parent,
+        'id': f'conversation-{i}',
+    }
+
+
+def _legacy_conversation(i: int, messages: int = 3, text: str = '') -> dict:
+    """One conversation in the legacy format: an ``id`` first and a flat ``messages`` list."""
+    return {
+        'id': f'legacy-{i}',
+        'title': f'Imported chat {i}',
+        'messages': [
+            {
+                'author': {'role': 'user' if j % 2 == 0 else 'assistant'},
+                'text': f'legacy message {j} of conversation {i} {text}'.strip(),
+                'create_time': BASE_TIME + i * 3600 + j * 60,
+            }
+            for j in range(messages)
+        ],
+    }
+
+
+@pytest.fixture
+def conversation():
+    return _conversation
+
+
+@pytest.fixture
+def legacy_conversation():
+    return _legacy_conversation
+
+
+@pytest.fixture
+def export():
+    """Build ``conversations.json`` bytes from a list of conversations."""
+    def build(conversations: list[dict]) -> bytes:
+        return json.dumps(conversations, indent=1).encode()
+
+    return build
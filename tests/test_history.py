@@ -0,0 +1,95 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from chatgpt_wrapped.history import HistoryStore, _normalize_batch, scan_export
+from chatgpt_wrapped.parsing import MessageColumns
+from chatgpt_wrapped.pipeline import MESSAGE_ROLES, TEXT_ROLES, load_export
+
+
+# Two or more citations repeat the boundary pattern inside a conversation
+SPLIT = [i % 4 >= 2 for i in range(30)]
+
+
+@pytest.fixture
+def conversations(conversation):
+    return [conversation(i, citations=i % 4) for i in range(30)]
+
+
+def ingest_matches_full_parse(store: HistoryStore, raw: bytes) -> dict:
+    got = store.ingest(io.BytesIO(raw))
+    expected = load_export(io.BytesIO(raw))
+    pd.testing.assert_frame_equal(got['df'], expected['df'])
+    pd.testing.assert_series_equal(got['conversation_ids'], expected['conversation_ids'])
+    assert got['total_convos'] == expected['total_convos']
+    assert got['messages_seen'] == expected['messages_seen']
+    return got['delta']
+
+
+def test_scan_export_fingerprints_whole_conversations_only(conversations, export):
+    raw = export(conversations)
+    segments = scan_export(io.BytesIO(raw), chunk_size=128)
+    # Split conversations are cut into pieces that cannot be fingerprinted
+    assert sum(fingerprint is not None for _, _, fingerprint, _ in segments) == SPLIT.count(False)
+    assert len(segments) > len(conversations)
+    for (_, end, _, _), (start, _, _, _) in zip(segments, segments[1:]):
+        assert raw[end:start].strip() == b','
+
+
+def test_normalize_batch_decodes_the_pieces_of_one_conversation_together(conversation, export):
+    raw = export([conversation(0, citations=3)])
+    segments = scan_export(io.BytesIO(raw))
+    assert len(segments) > 1
+    bounds = [(start, end) for start, end, _, _ in segments]
+    columns, sizes = _normalize_batch(raw, bounds, MessageColumns(MESSAGE_ROLES, TEXT_ROLES))
+    assert sizes[0] == (len(columns), 4, 1, False)
+    assert sizes[1:] == [(0, 0, 0, False)] * (len(segments) - 1)
+
+
+def test_reupload_reuses_unchanged_and_reparses_split_conversations(tmp_path, conversations, conversation, export):
+    store = HistoryStore(tmp_path)
+    assert ingest_matches_full_parse(store, export(conversations))['reused'] == 0
+
+    delta = ingest_matches_full_parse(store, export(conversations))
+    # Split conversations have no fingerprint and are parsed on every upload
+    assert (delta['reused'], delta['parsed']) == (SPLIT.count(False), SPLIT.count(True))
+
+    edited = json.loads(json.dumps(conversations))
+    for convo in edited[4:7]:
+        convo['update_time'] += 60
+        convo['mapping'][next(iter(convo['mapping']))]['message']['content']['parts'] = ['changed']
+    del edited[10]
+    edited.append(conversation(30, text='new'))
+    delta = ingest_matches_full_parse(store, export(edited))
+    # Edited conversations are still in the export; only the deleted one is removed
+    assert delta['removed'] == 1
+
+
+def test_reupload_survives_a_boundary_inside_a_changed_conversation(tmp_path, conversation, export):
+    store = HistoryStore(tmp_path)
+    ingest_matches_full_parse(store, export([conversation(i, citations=0) for i in range(10)]))
+    changed = [conversation(i, citations=0) for i in range(10)]
+    changed[5] = conversation(5, messages=6, citations=3)
+    delta = ingest_matches_full_parse(store, export(changed))
+    assert (delta['reused'], delta['parsed'], delta['removed']) == (9, 1, 0)
+
+
+def test_reupload_reuses_legacy_conversations_between_mapping_ones(tmp_path, conversation, legacy_conversation, export):
+    convos = [conversation(i, citations=0) for i in range(10)]
+    convos[3:3] = [legacy_conversation(3), legacy_conversation(4, messages=1)]
+    convos.append(legacy_conversation(10))
+    segments = scan_export(io.BytesIO(export(convos)))
+    # Each legacy conversation is found, although boundaries are cut at '{"title"'
+    assert [fingerprint.split('|')[0] for _, _, fingerprint, _ in segments] == [convo['id'] for convo in convos]
+
+    store = HistoryStore(tmp_path)
+    ingest_matches_full_parse(store, export(convos))
+    delta = ingest_matches_full_parse(store, export(convos))
+    assert (delta['reused'], delta['parsed'], delta['removed']) == (13, 0, 0)
+
+    convos[3] = legacy_conversation(3, text='edited')
+    del convos[4]
+    delta = ingest_matches_full_parse(store, export(convos))
+    assert (delta['reused'], delta['parsed'], delta['removed']) == (11, 1, 1)
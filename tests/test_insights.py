@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from chatgpt_wrapped.insights import IncompleteSummary, http_generate, split_prompt, summarize_history_sync
+from chatgpt_wrapped.stub_model import StubModelServer
+
+CHUNK_TOKENS = 50
+FAIL = 'unanswerable'
+
+
+def history(conversations: int = 16, failing: tuple[int, ...] = ()) -> str:
+    """A prompt of ``conversations`` blank-line separated conversations, each about one chunk."""
+    words = ['python', 'pandas', 'travel', 'recipe', 'garden', 'guitar']
+    return '\n\n'.join(
+        ' '.join(words[(i + j) % len(words)] for j in range(20 + i % 3)) + (f' {FAIL}' if i in failing else '')
+        for i in range(conversations)
+    )
+
+
+@pytest.fixture
+def stub(request):
+    server = StubModelServer(**getattr(request, 'param', {})).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def summarize(stub: StubModelServer, prompt: str, **options) -> str:
+    options = {'chunk_tokens': CHUNK_TOKENS, 'concurrency': 3, 'retries': 2, 'backoff': 0.01, 'timeout': 10, **options}
+    return summarize_history_sync(prompt, http_generate(stub.url), **options)
+
+
+@pytest.mark.parametrize('stub', [{'delay': 0.05, 'fail_rate': 0.3, 'seed': 1}], indirect=True)
+def test_at_most_concurrency_calls_are_in_flight(stub):
+    try:
+        summarize(stub, history(), retries=5)
+    except IncompleteSummary:
+        pass
+    # Retried calls release their slot while they back off
+    assert 1 < stub.max_in_flight <= 3
+
+
+def test_all_chunks_summarized_returns_the_reduced_answer(stub):
+    prompt = history()
+    chunks = split_prompt(prompt, CHUNK_TOKENS)
+    assert len(chunks) > 3
+    result = json.loads(summarize(stub, prompt, fan_in=len(chunks)))
+    # One model reduce over every chunk's answer, not the local fallback merge
+    assert stub.requests_served == len(chunks) + 1
+    assert result['summary'].count('This part of the history') == 1
+    assert result['topics']
+
+
+@pytest.mark.parametrize('stub', [{'fail_marker': FAIL}], indirect=True)
+def test_chunks_that_exhaust_their_retries_make_the_summary_incomplete(stub):
+    prompt = history(failing=(0, 7))
+    chunks = split_prompt(prompt, CHUNK_TOKENS)
+    failed = sum(FAIL in chunk for chunk in chunks)
+    assert failed >= 1
+    with pytest.raises(IncompleteSummary) as excinfo:
+        summarize(stub, prompt)
+    assert (excinfo.value.summarized, excinfo.value.total) == (len(chunks) - failed, len(chunks))
+    assert json.loads(excinfo.value.text)['topics']
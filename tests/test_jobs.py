@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from chatgpt_wrapped.jobs import JobQueue, QueueFull, RateLimiter, RequestLimitExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_limiter_refuses_once_the_window_is_used_up():
+    clock = FakeClock()
+    limiter = RateLimiter(3, 60, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        limiter.acquire(max_wait=0)
+    assert limiter.remaining() == 0
+    with pytest.raises(RequestLimitExceeded):
+        limiter.acquire(max_wait=0)
+
+    clock.now += 60
+    assert limiter.remaining() == 3
+    limiter.acquire(max_wait=0)
+
+
+def test_limiter_waits_for_a_slot_within_max_wait():
+    clock = FakeClock()
+    limiter = RateLimiter(1, 10, clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+    limiter.acquire(max_wait=10)
+    assert clock.slept == [10]
+    with pytest.raises(RequestLimitExceeded):
+        limiter.acquire(max_wait=5)
+
+
+def test_limiter_without_a_limit_never_refuses():
+    limiter = RateLimiter(0, 60)
+    for _ in range(100):
+        limiter.acquire()
+    assert limiter.remaining() is None
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=1, max_pending=2)
+    yield queue
+    queue.shutdown()
+
+
+def test_full_queue_rejects_new_work(queue):
+    release = threading.Event()
+    running = [queue.submit(f'job-{i}', release.wait) for i in range(2)]
+    with pytest.raises(QueueFull):
+        queue.submit('job-2', release.wait)
+    assert queue.stats()['rejected'] == 1
+
+    release.set()
+    for future in running:
+        future.result(timeout=5)
+    # Finished jobs free their slots from a done callback, just after their result is set
+    deadline = time.monotonic() + 5
+    while queue.stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queue.submit('job-2', lambda: 'done').result(timeout=5) == 'done'
+
+
+def test_same_key_shares_one_job(queue):
+    release = threading.Event()
+    calls = []
+
+    def job():
+        calls.append(1)
+        release.wait()
+        return 'result'
+
+    first = queue.submit('same', job)
+    second = queue.submit('same', job)
+    release.set()
+    assert second is first
+    assert second.result(timeout=5) == 'result'
+    assert len(calls) == 1
+    assert queue.stats()['shared'] == 1
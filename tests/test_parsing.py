@@ -0,0 +1,83 @@
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from chatgpt_wrapped import parsing
+from chatgpt_wrapped.parsing import (
+    MessageColumns,
+    decode_elements,
+    iter_elements,
+    parse_export,
+    parse_export_parallel,
+)
+
+
+@pytest.fixture
+def raw(conversation, export):
+    return export([conversation(i, citations=i % 4) for i in range(30)])
+
+
+def test_iter_elements_splits_at_false_boundaries_without_losing_bytes(raw):
+    runs = list(iter_elements(io.BytesIO(raw), chunk_size=64))
+    # Citations repeat the boundary pattern, so some conversations come in pieces
+    assert len(runs) > 30
+    for offset, run in runs:
+        assert raw[offset:offset + len(run)] == run
+    assert json.loads(b'[' + b','.join(run for _, run in runs) + b']') == json.loads(raw)
+
+
+def test_iter_elements_runs_are_at_least_min_bytes(raw):
+    runs = [run for _, run in iter_elements(io.BytesIO(raw), min_bytes=2000, chunk_size=256)]
+    assert all(len(run) >= 2000 for run in runs[:-1])
+    assert json.loads(b'[' + b','.join(runs) + b']') == json.loads(raw)
+
+
+def test_iter_elements_rejects_non_arrays():
+    with pytest.raises(ValueError):
+        list(iter_elements(io.BytesIO(b'{"conversations": []}')))
+    with pytest.raises(ValueError):
+        list(iter_elements(io.BytesIO(b'[{"title": "a"}, {"title": "b"')))
+
+
+def test_iter_elements_accepts_any_key_when_the_first_one_never_repeats(conversation, export, monkeypatch):
+    monkeypatch.setattr(parsing, 'KEYED_CUT_BYTES', 4000)
+    legacy = {'id': 'legacy-0', 'title': 'Imported chat', 'messages': [{'author': {'role': 'user'}, 'text': 'hello'}]}
+    raw = export([legacy] + [conversation(i, citations=0) for i in range(30)])
+    # No later conversation starts with "id"; past the limit the run is rescanned for any key
+    runs = [run for _, run in iter_elements(io.BytesIO(raw), chunk_size=256)]
+    assert len(runs) == 31
+    assert json.loads(b'[' + b','.join(runs) + b']') == json.loads(raw)
+
+
+def test_decode_elements_stops_at_a_cut_off_element():
+    text = '{"a": 1} ,\n{"b": "x"}, {"c": [1, 2'
+    decoded = list(decode_elements(text))
+    assert [value for value, _ in decoded] == [{'a': 1}, {'b': 'x'}]
+    assert text[decoded[-1][1]:] == '{"c": [1, 2'
+
+
+@pytest.mark.parametrize('head', ['{"a": 1} {"b": 2}', '{"a": nul}', '{"a": 1}, ]'])
+def test_decode_elements_rejects_malformed_json(head):
+    # Errors right at the end of the text may be a cut-off element instead
+    with pytest.raises(ValueError):
+        list(decode_elements(head + ', {"padding": 0}' * 4))
+
+
+@pytest.mark.parametrize('slice_bytes', [1, 300, 5000, 1 << 20])
+def test_parallel_parse_matches_serial(raw, slice_bytes):
+    # Tiny slices end at every candidate, so cut-off tails are re-run with the
+    # next slice, sometimes several times over for one conversation
+    expected, n_expected = parse_export(io.BytesIO(raw), MessageColumns())
+    with ThreadPoolExecutor(2) as executor:
+        columns, n_convos = parse_export_parallel(io.BytesIO(raw), MessageColumns(), executor=executor, slice_bytes=slice_bytes)
+    assert n_convos == n_expected == 30
+    pd.testing.assert_frame_equal(columns.to_frame(), expected.to_frame())
+    pd.testing.assert_series_equal(columns.conversation_index(), expected.conversation_index())
+
+
+def test_parallel_parse_rejects_a_truncated_export(raw):
+    with ThreadPoolExecutor(2) as executor, pytest.raises(ValueError):
+        parse_export_parallel(io.BytesIO(raw[:-200] + b']'), executor=executor, slice_bytes=300)
@@ -0,0 +1,87 @@
+import datetime as dt
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chatgpt_wrapped.search import SearchIndex, parse_query
+
+from conftest import BASE_TIME
+
+WORDS = ['pandas', 'panda', 'Pandemic', 'merge', 'merged', 'data', 'frame', 'café', 'naïve', 'snake_case', 'x2']
+ROLES = ['user', 'assistant', 'tool']
+
+
+@pytest.fixture(scope='module')
+def messages():
+    rng = np.random.default_rng(0)
+    n = 400
+    content = [
+        ' '.join(str(word) + str(rng.choice(['', ',', '.', ' -', '!'])) for word in rng.choice(WORDS, rng.integers(0, 12)))
+        for _ in range(n)
+    ]
+    content[::37] = [None] * len(content[::37])
+    return pd.DataFrame({
+        'conversation': np.arange(n, dtype=np.int32) // 5,
+        'role': pd.Categorical.from_codes(rng.integers(0, len(ROLES), n).astype(np.int8), ROLES),
+        'content': pd.array(content, dtype=pd.StringDtype('pyarrow')),
+        'timestamp': BASE_TIME + np.arange(n, dtype=np.int64) * 1_800,
+    })
+
+
+@pytest.fixture(scope='module')
+def index(messages):
+    return SearchIndex.build(messages)
+
+
+def scan(messages: pd.DataFrame, query: str, start=None, end=None, roles=None) -> np.ndarray:
+    """Row positions matching ``query``, found with a regex over every message."""
+    patterns = []
+    for kind, words in parse_query(query):
+        body = r'[\W_]+'.join(map(re.escape, words))
+        patterns.append(re.compile(r'(?<![^\W_])' + body + ('' if kind == 'prefix' else r'(?![^\W_])'), re.IGNORECASE))
+    rows = []
+    for row, (text, role, timestamp) in enumerate(zip(messages['content'], messages['role'], messages['timestamp'])):
+        day = dt.datetime.fromtimestamp(timestamp, dt.timezone.utc).date()
+        if (
+            patterns
+            and isinstance(text, str)
+            and all(pattern.search(text) for pattern in patterns)
+            and (start is None or day >= start)
+            and (end is None or day <= end)
+            and (roles is None or role in roles)
+        ):
+            rows.append(row)
+    return np.array(rows, dtype=np.int32)
+
+
+@pytest.mark.parametrize('query', [
+    'pandas', 'PANDA', 'café', 'snake', 'case', 'x2', 'pandas merge', 'missing',
+    'pand*', 'merge*', 'na*', 'pand* data',
+    '"data frame"', '"frame data"', '"pandas, merge"', '"snake case"', '"data frame" merge*',
+])
+def test_queries_match_a_scan(messages, index, query):
+    result = index.search(messages, query)
+    np.testing.assert_array_equal(result['rows'], scan(messages, query))
+    assert result['count'] == len(result['rows'])
+
+
+@pytest.mark.parametrize('start, end, roles', [
+    (dt.date(2023, 11, 17), None, None),
+    (None, dt.date(2023, 11, 18), None),
+    (dt.date(2023, 11, 18), dt.date(2023, 11, 19), None),
+    (None, None, ['user']),
+    (None, None, ['assistant', 'tool']),
+    (dt.date(2023, 11, 18), dt.date(2023, 11, 20), ['user']),
+])
+def test_date_and_role_filters_match_a_scan(messages, index, start, end, roles):
+    result = index.search(messages, 'pand* merge', start=start, end=end, roles=roles)
+    expected = scan(messages, 'pand* merge', start=start, end=end, roles=roles)
+    np.testing.assert_array_equal(result['rows'], expected)
+    days = messages['timestamp'].to_numpy()[expected] // 86_400
+    assert result['daily_counts'].to_dict() == pd.Series(days).value_counts().to_dict()
+
+
+def test_empty_query_matches_nothing(messages, index):
+    assert index.search(messages, '  "" * ')['count'] == 0
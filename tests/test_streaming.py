@@ -0,0 +1,49 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from chatgpt_wrapped.pipeline import describe, histograms, load_export, quick_stats, stream_export, usage_patterns
+
+
+@pytest.fixture
+def raw(conversation, export):
+    # Uneven conversation lengths over several days, hours and weekdays
+    return export([conversation(i * 5, messages=1 + i % 7, citations=i % 3) for i in range(40)])
+
+
+def report(stats: dict, total_convos: int) -> dict:
+    return {
+        'quick_stats': quick_stats(stats, total_convos),
+        'usage_patterns': usage_patterns(stats),
+        'histograms': histograms(stats),
+    }
+
+
+def assert_same_report(streamed: dict, expected: dict) -> None:
+    assert streamed['quick_stats'] == expected['quick_stats']
+    assert streamed['usage_patterns'] == expected['usage_patterns']
+    assert streamed['histograms'].keys() == expected['histograms'].keys()
+    for name, counts in expected['histograms'].items():
+        assert streamed['histograms'][name].equals(counts), name
+
+
+def test_stream_export_matches_the_dataframe_path(raw):
+    loaded = load_export(io.BytesIO(raw))
+    streamed = stream_export(io.BytesIO(raw))
+    assert streamed['total_convos'] == loaded['total_convos'] == 40
+    assert streamed['messages_seen'] == loaded['messages_seen']
+    assert_same_report(
+        report(streamed['stats'], streamed['total_convos']),
+        report(describe(loaded['df']), loaded['total_convos']),
+    )
+
+
+def test_parallel_stream_export_matches_the_dataframe_path(raw):
+    loaded = load_export(io.BytesIO(raw))
+    with ThreadPoolExecutor(2) as executor:
+        streamed = stream_export(io.BytesIO(raw), executor=executor, parallel_bytes=0)
+    assert_same_report(
+        report(streamed['stats'], streamed['total_convos']),
+        report(describe(loaded['df']), loaded['total_convos']),
+    )